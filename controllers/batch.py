@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+from urllib.parse import urlsplit
+
+from fastapi import HTTPException
+from models.batch import BatchOperation
+from utils.tracing import traced
+
+# Tope de sub-peticiones por llamada a /batch
+batch_max_requests: int = int(os.getenv("BATCH_MAX_REQUESTS", "50"))
+# Sub-peticiones en vuelo a la vez, sumando todas las llamadas a /batch del worker
+batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+_semaphore: asyncio.Semaphore | None = None
+_semaphore_loop = None
+
+def _concurrency_limit() -> asyncio.Semaphore:
+    # Compartido por todos los /batch; se recrea si cambia el loop (reinicio del lifespan)
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(batch_max_concurrency)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+async def _dispatch( app, scope: dict, operation: BatchOperation ) -> dict:
+    # Llama a la aplicación ASGI directamente: mismo enrutado y validación, sin red ni serialización HTTP
+    url = urlsplit(operation.path)
+    payload = b"" if operation.body is None else json.dumps(operation.body).encode("utf-8")
+
+    headers = [(b"accept", b"application/json")]
+    if payload:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode("ascii"))]
+
+    sub_scope = {
+        "type": "http"
+        , "asgi": scope.get("asgi", {"version": "3.0"})
+        , "http_version": "1.1"
+        , "method": operation.method
+        , "scheme": scope.get("scheme", "http")
+        , "path": url.path
+        , "raw_path": url.path.encode("utf-8")
+        , "query_string": url.query.encode("utf-8")
+        , "root_path": scope.get("root_path", "")
+        , "headers": headers
+        , "client": scope.get("client")
+        , "server": scope.get("server")
+    }
+    if "state" in scope:
+        sub_scope["state"] = scope["state"]
+
+    done = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        # Starlette escucha desconexiones mientras responde; solo llega al terminar
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    status_code = 500
+    response_headers = {}
+    chunks = []
+
+    async def send( message ):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            response_headers.update({ key.decode("latin-1"): value.decode("latin-1") for key, value in message.get("headers", []) })
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(sub_scope, receive, send)
+    except Exception as e:
+        return {"status": 500, "body": {"detail": f"Batch dispatch error: { str(e) }"}}
+    finally:
+        done.set()
+
+    raw = b"".join(chunks)
+    body = None
+    if raw:
+        content_type = response_headers.get("content-type", "")
+        if content_type.startswith("application/json"):
+            body = json.loads(raw)
+        else:
+            body = raw.decode("utf-8", errors="replace")
+    return {"status": status_code, "body": body}
+
+
+@traced
+async def execute_batch( app, scope: dict, operations: list[BatchOperation] ) -> list:
+    if len(operations) > batch_max_requests:
+        raise HTTPException(status_code=413, detail=f"Batch requests are limited to {batch_max_requests} operations")
+
+    semaphore = _concurrency_limit()
+
+    async def run( operation: BatchOperation ) -> dict:
+        async with semaphore:
+            return await _dispatch(app, scope, operation)
+
+    results = []
+    reads = []
+    # Las lecturas consecutivas corren en paralelo; cada escritura espera a lo anterior
+    # y bloquea a lo siguiente para conservar el orden observable del lote
+    for operation in operations:
+        if operation.method == "GET":
+            reads.append(operation)
+            continue
+        if reads:
+            results += await asyncio.gather(*[ run(read) for read in reads ])
+            reads = []
+        results.append(await run(operation))
+    if reads:
+        results += await asyncio.gather(*[ run(read) for read in reads ])
+
+    return [ {"index": index, **result} for index, result in enumerate(results) ]
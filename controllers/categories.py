@@ -4,64 +4,149 @@ import logging
 from fastapi import HTTPException
 
 from models.categories import Category
-from utils.database import execute_query_json
-
-logging.basicConfig(level=logging.INFO)
+from utils.database import execute_query, stream_query
+from utils.pagination import Keyset
+from utils.query import Projection
+from utils.dataloader import DataLoader
+from utils.bulk import bulk_create, check_bulk_size
+from controllers.games import games_cache
+from utils.etag import bump_version
+from utils.cache import TTLCache, MISSING, cached_get_one, cached_multi_get, reference_cache_maxsize, reference_cache_ttl
+from utils.tracing import traced
+from utils.log import setup_logging
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Tabla de referencia: cambia poco y se lee constantemente
+categories_cache = TTLCache("categories", maxsize=reference_cache_maxsize, ttl=reference_cache_ttl)
+
+# Columnas admitidas en ?fields= : campo -> (expresión SQL, join que la aporta)
+CATEGORY_FIELDS = Projection(
+    Category
+    , {
+        "id": ("[id]", None)
+        , "name": ("[name]", None)
+        , "description": ("[description]", None)
+    }
+)
+
 # ============================================================
 #                CRUD OPERATIONS FOR CATEGORIES
 # ============================================================
 
-async def get_one( id:int ) -> Category:
+async def load_many( ids: list[int] ) -> dict:
 
     selectscript = """
         SELECT [id]
             ,[name]
             ,[description]
         FROM [gamehub].[categories]
-        WHERE [id] = ?
+        WHERE [id] IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) );
     """
 
-    params = [id]
-    result_dict = []
+    params = [json.dumps(ids)]
 
-    try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+    result_dict = await execute_query(selectscript, params=params)
+    return { row["id"]: row for row in result_dict }
+
+async def load_projection( id: int, fields: list[str] ) -> dict | None:
+
+    selectscript = f"""
+        SELECT {CATEGORY_FIELDS.select(fields)}
+        FROM [gamehub].[categories]
+        WHERE [id] = ?;
+    """
+
+    result_dict = await execute_query(selectscript, params=[id])
+    return result_dict[0] if result_dict else None
+
+# Los get_one concurrentes de distintas peticiones se resuelven con una sola consulta
+categories_loader = DataLoader("categories", load_many)
+
+@traced
+async def get_one( id:int, fields: str | None = None ) -> Category:
+
+    fields = CATEGORY_FIELDS.parse(fields)
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Category not found")
+    result = None
 
+    try:
+        result = await cached_get_one(categories_cache, lambda id: ("one", id), categories_loader.load, id, fields, load_projection)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
+
+    #Validacion de elemento vacio
+    if result is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return result
+
+@traced
+async def get_many( ids: list[int] ) -> dict:
+
+    try:
+        return await cached_multi_get(categories_cache, lambda id: ("one", id), load_many, ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
-async def get_all() -> list[Category]:
+@traced
+async def get_all( limit: int | None = None, cursor: str | None = None, fields: str | None = None ) -> list[Category]:
 
-    selectscript = """
-        SELECT [id]
-            ,[name]
-            ,[description]
+    fields = CATEGORY_FIELDS.parse(fields, ["id"] if limit is not None else [])
+
+    cache_key = ("all", limit, cursor, tuple(fields) if fields else None)
+    cached = categories_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    selectscript = f"""
+        SELECT {CATEGORY_FIELDS.select(fields)}
         FROM [gamehub].[categories]
     """
 
+    params = []
+    keyset = None
+    if limit is not None:
+        keyset = Keyset([("[id]", "id")], limit, cursor)
+        selectscript, params = keyset.apply(selectscript, params)
+
     result_dict = []
+    generation = categories_cache.generation
 
     try:
-        result = await execute_query_json(selectscript)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
+        if keyset:
+            result_dict = keyset.page(result_dict)
+        categories_cache.set(cache_key, result_dict, generation)
         return result_dict
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+@traced
+async def stream_all( fields: str | None = None ):
+
+    fields = CATEGORY_FIELDS.parse(fields)
+
+    selectscript = f"""
+        SELECT {CATEGORY_FIELDS.select(fields)}
+        FROM [gamehub].[categories]
+    """
+
+    try:
+        return await stream_query(selectscript)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
+@traced
 async def create_category( category: Category ) -> Category:
     
+    # OUTPUT devuelve la fila creada en el mismo viaje a la base de datos
     createscript = """
         INSERT INTO [gamehub].[categories] ( [name] ,[description]) 
+        OUTPUT INSERTED.[id]
+            , INSERTED.[name]
+            , INSERTED.[description]
         VALUES ( ?, ?);
     """
 
@@ -70,36 +155,41 @@ async def create_category( category: Category ) -> Category:
         , category.description
     )
 
-    insert_result = None
+    result_dict = []
 
     try:
-        insert_result = await execute_query_json( createscript, params, needs_commit=True )
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        categories_cache.clear()
+        bump_version("categories")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-    
-    sqlfind: str = """
-        SELECT [id]
-            ,[name]
-            ,[description]
-        FROM [gamehub].[categories]
-        WHERE [name] = ?
-    """
 
-    params = [category.name]
+    #Validacion de elemento vacio
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el registro insertado.")
 
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
+    return result_dict[0]
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            return []
+@traced
+async def create_categories_bulk( categories: list[dict], chunk_size: int | None = None ) -> dict:
 
+    check_bulk_size(categories)
+
+    columns = ["name", "description"]
+
+    try:
+        result = await bulk_create(
+            Category, "[gamehub].[categories]", columns, categories, chunk_size
+            , required=("name",)
+        )
+        if result["inserted"]:
+            categories_cache.clear()
+        bump_version("categories")
+        return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
+@traced
 async def update_category( game:Category ) -> Category:
 
     dict = game.model_dump(exclude_none=True)
@@ -111,40 +201,30 @@ async def update_category( game:Category ) -> Category:
     updatescript = f"""
         UPDATE [gamehub].[categories]
         SET {variables}
+        OUTPUT INSERTED.[id]
+            , INSERTED.[name]
+            , INSERTED.[description]
         WHERE [id] = ?;
     """
 
     params = [ dict[v] for v in keys ]
     params.append( game.id )
 
-    update_result = None
+    result_dict = []
     try:
-        update_result = await execute_query_json( updatescript, params, needs_commit=True )
+        result_dict = await execute_query( updatescript, params, needs_commit=True )
+        categories_cache.clear()
+        games_cache.clear()
+        bump_version("categories")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
-    sqlfind: str = """
-        SELECT [id]
-            ,[name]
-            ,[description]
-        FROM [gamehub].[categories]
-        WHERE [id] = ?
-    """
-
-    params = [game.id]
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=404, detail="Category not found")
 
-    result_dict=[]
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
-
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Category not found")
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Database error: { str(e) }")
+    return result_dict[0]
 
+@traced
 async def delete_category( id:int ) -> str:
 
     deletescript = """
@@ -155,7 +235,10 @@ async def delete_category( id:int ) -> str:
     params = [id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        categories_cache.clear()
+        games_cache.clear()
+        bump_version("categories")
         return "DELETED"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
\ No newline at end of file
@@ -1,21 +1,92 @@
+import asyncio
 import json
 import logging
+from datetime import date, datetime
 
 from fastapi import HTTPException
 
 from models.games import Game
 from models.players_games import PlayerGame
 from models.games_platforms import GamePlatform
-from utils.database import execute_query_json
-
-logging.basicConfig(level=logging.INFO)
+from utils.database import execute_query, stream_query
+from utils.pagination import Keyset, apply_order
+from utils.query import Filters, Projection, parse_sort
+from utils.dataloader import DataLoader
+from utils.bulk import bulk_create, check_bulk_size
+from utils.search import SearchIndex, search_default_limit
+from utils.etag import bump_version
+from utils.cache import TTLCache, cached_get_one, cached_multi_get, entity_cache_maxsize, entity_cache_ttl
+from utils.tracing import traced
+from utils.log import setup_logging
+from controllers.players import PLAYER_GAME_SORTS, PLAYER_GAME_FIELDS
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# LRU por id para el endpoint más consultado
+games_cache = TTLCache("games", maxsize=entity_cache_maxsize, ttl=entity_cache_ttl)
+
+# Columnas admitidas en ?sort= : nombre -> (expresión SQL, admite NULL)
+GAME_SORTS = {
+    "id": ("g.id", False)
+    , "title": ("g.title", False)
+    , "release_date": ("g.release_date", True)
+    , "categories_id": ("g.categories_id", False)
+}
+GAME_PLATFORM_SORTS = {
+    "active": ("gp.active", False)
+    , "title": ("g.title", False)
+    , "platform_name": ("p.name", False)
+}
+
+# Columnas admitidas en ?fields= : campo -> (expresión SQL, join que la aporta)
+GAME_FIELDS = Projection(
+    Game
+    , {
+        "id": ("g.id", None)
+        , "categories_id": ("g.categories_id", None)
+        , "category_name": ("c.name as category_name", "categories")
+        , "title": ("g.title", None)
+        , "release_date": ("g.release_date", None)
+    }
+    , joins={ "categories": "INNER JOIN gamehub.categories c on g.categories_id = c.id" }
+    , display=("category_name",)
+)
+GAME_PLATFORM_FIELDS = Projection(
+    GamePlatform
+    , {
+        "game_id": ("gp.games_id as game_id", None)
+        , "title": ("g.title", "games")
+        , "platform_id": ("gp.platforms_id as platform_id", None)
+        , "platform_name": ("p.name as platform_name", "platforms")
+        , "active": ("gp.active", None)
+    }
+    , joins={
+        "platforms": "INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id"
+        , "games": "INNER JOIN gamehub.games g ON gp.games_id = g.id"
+    }
+    , display=("game_id", "title", "platform_id", "platform_name")
+)
+
+async def _load_search_rows() -> list:
+
+    selectscript = """
+        SELECT [id]
+            ,[title]
+            ,[release_date]
+        FROM [gamehub].[games];
+    """
+
+    return await execute_query(selectscript)
+
+# Índice de trigramas sobre title; se mantiene al día desde las escrituras de este módulo
+games_index = SearchIndex("games", "title", ["id", "title", "release_date"], _load_search_rows)
+
 # ============================================================
 #                    CRUD OPERATIONS FOR GAMES
 # ============================================================
 
-async def get_one( id:int ) -> Game:
+async def load_many( ids: list[int] ) -> dict:
 
     selectscript = """
         SELECT g.id
@@ -25,78 +96,181 @@ async def get_one( id:int ) -> Game:
             , g.release_date
         FROM gamehub.games g
         INNER JOIN gamehub.categories c on g.categories_id = c.id
+        WHERE g.id IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) );
+    """
+
+    params = [json.dumps(ids)]
+
+    result_dict = await execute_query(selectscript, params=params)
+    return { row["id"]: row for row in result_dict }
+
+async def load_projection( id: int, fields: list[str] ) -> dict | None:
+
+    selectscript = f"""
+        SELECT {GAME_FIELDS.select(fields)}
+        FROM gamehub.games g
+        {GAME_FIELDS.join(fields)}
         WHERE g.id = ?;
     """
 
-    params = [id]
-    result_dict = []
+    result_dict = await execute_query(selectscript, params=[id])
+    return result_dict[0] if result_dict else None
 
-    try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+# Los get_one concurrentes de distintas peticiones se resuelven con una sola consulta
+games_loader = DataLoader("games", load_many)
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Game not found")
+@traced
+async def get_one( id:int, fields: str | None = None ) -> Game:
+
+    fields = GAME_FIELDS.parse(fields)
+
+    result = None
 
+    try:
+        result = await cached_get_one(games_cache, lambda id: id, games_loader.load, id, fields, load_projection)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
-    
-async def get_all() -> list[Game]:
 
-    selectscript = """
-        SELECT g.id
-            , g.categories_id
-            , c.name as category_name
+    #Validacion de elemento vacio
+    if result is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return result
+
+@traced
+async def get_many( ids: list[int] ) -> dict:
+
+    try:
+        return await cached_multi_get(games_cache, lambda id: id, load_many, ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+@traced
+async def search( q: str, limit: int | None = None ) -> list[dict]:
+    await games_index.ensure_loaded()
+    if not games_index.loaded:
+        raise HTTPException(status_code=503, detail="Search index is not available")
+    # La puntuación es CPU pura: fuera del event loop
+    return await asyncio.to_thread(games_index.search, q, limit or search_default_limit)
+
+# Relaciones que GET /games/{id}?include= puede incrustar
+GAME_INCLUDES = ("platforms", "players", "player_count")
+
+@traced
+async def get_one_with( id:int, include: list[str], fields: str | None = None ) -> dict:
+
+    platformsscript = """
+        SELECT gp.games_id as game_id
             , g.title
-            , g.release_date
-        FROM gamehub.games g
-        INNER JOIN gamehub.categories c on g.categories_id = c.id;
+            , gp.platforms_id as platform_id
+            , p.name as platform_name
+            , gp.active
+        FROM gamehub.games_platforms gp
+        INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id 
+        INNER JOIN gamehub.games g ON gp.games_id = g.id
+        WHERE gp.games_id = ?;
     """
 
-    result_dict = []
+    playersscript = """
+        SELECT pc.player_id
+            ,p.nickname 
+            ,pc.game_id
+            ,g.title
+            ,pc.registered_date
+        FROM gamehub.players_games pc 
+        INNER JOIN gamehub.players p  ON pc.player_id = p.id 
+        INNER JOIN gamehub.games g ON pc.game_id = g.id
+        WHERE pc.game_id = ?;
+    """
 
-    try:
-        result = await execute_query_json(selectscript)
-        result_dict = json.loads(result)
-        return result_dict
+    countscript = """
+        SELECT COUNT(*) as player_count
+        FROM gamehub.players_games
+        WHERE game_id = ?;
+    """
+
+    scripts = {
+        "platforms": platformsscript
+        , "players": playersscript
+        , "player_count": countscript
+    }
 
+    try:
+        # Cada consulta usa su propia conexión del pool y corren a la vez
+        game, *related = await asyncio.gather(
+            get_one(id, fields)
+            , *[ execute_query(scripts[name], params=[id]) for name in include ]
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+    document = dict(game)
+    for name, rows in zip(include, related):
+        document[name] = rows[0]["player_count"] if name == "player_count" else rows
+    return document
     
-async def create_game( game: Game ) -> Game:
-    
-    createscript = """
-        INSERT INTO [gamehub].[games] ( [categories_id] ,[title] ,[release_date]) 
-        OUTPUT INSERTED.[id]
-        VALUES ( ?, ?, ?);
+def _select_games( limit: int | None, cursor: str | None, categories_id: int | None, release_date_from: date | None, release_date_to: date | None, title: str | None, sort: str | None, fields: str | None ) -> tuple[str, list, Keyset | None]:
+    # SQL común a get_all y stream_all: con limit se pagina por cursor, sin él solo se ordena si se pidió
+    keys = parse_sort(sort, GAME_SORTS, [("g.id", "id")])
+    fields = GAME_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
+
+    selectscript = f"""
+        SELECT {GAME_FIELDS.select(fields)}
+        FROM gamehub.games g
+        {GAME_FIELDS.join(fields)}
     """
 
-    params = (
-        game.categories_id
-        , game.title
-        , game.release_date
+    filters = (
+        Filters()
+        .equals("g.categories_id", categories_id)
+        .between("g.release_date", release_date_from, release_date_to)
+        .prefix("g.title", title)
     )
+    selectscript, params = filters.apply(selectscript, [])
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, GAME_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=bool(filters))
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
+    return selectscript, params, keyset
+
+@traced
+async def get_all( limit: int | None = None, cursor: str | None = None, categories_id: int | None = None, release_date_from: date | None = None, release_date_to: date | None = None, title: str | None = None, sort: str | None = None, fields: str | None = None ) -> list[Game]:
+
+    selectscript, params, keyset = _select_games(limit, cursor, categories_id, release_date_from, release_date_to, title, sort, fields)
 
-    insert_result = None
+    result_dict = []
 
     try:
-        # Es para obtener el id generado con OUTPUT
-        insert_result = await execute_query_json(createscript, params, needs_commit=True)
-        insert_dict = json.loads(insert_result)
+        result_dict = await execute_query(selectscript, params=params)
+        if keyset:
+            return keyset.page(result_dict)
+        return result_dict
 
-        if len(insert_dict) == 0 or "id" not in insert_dict[0]:
-            raise HTTPException(status_code=500, detail="No se pudo recuperar el ID insertado.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
-        new_id = insert_dict[0]["id"]
+@traced
+async def stream_all( categories_id: int | None = None, release_date_from: date | None = None, release_date_to: date | None = None, title: str | None = None, sort: str | None = None, fields: str | None = None ):
 
+    selectscript, params, _ = _select_games(None, None, categories_id, release_date_from, release_date_to, title, sort, fields)
 
+    try:
+        return await stream_query(selectscript, params=params)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
-    sqlfind: str = """
+@traced
+async def create_game( game: Game ) -> Game:
+    
+    # INSERT y SELECT con el nombre de la categoría en un solo lote y transacción
+    createscript = """
+        INSERT INTO [gamehub].[games] ( [categories_id] ,[title] ,[release_date]) 
+        VALUES ( ?, ?, ?);
+
         SELECT g.id
             , g.categories_id
             , c.name as category_name
@@ -104,24 +278,51 @@ async def create_game( game: Game ) -> Game:
             , g.release_date
         FROM gamehub.games g
         INNER JOIN gamehub.categories c on g.categories_id = c.id
-        WHERE g.id = ?;
+        WHERE g.id = SCOPE_IDENTITY();
     """
 
-    params = [new_id]
+    params = (
+        game.categories_id
+        , game.title
+        , game.release_date
+    )
+
+    result_dict = []
 
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(createscript, params, needs_commit=True)
+        bump_version("games")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            return []
+    #Validacion de elemento vacio
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el ID insertado.")
+
+    games_index.add(result_dict[0])
+    return result_dict[0]
+
+@traced
+async def create_games_bulk( games: list[dict], chunk_size: int | None = None ) -> dict:
+
+    check_bulk_size(games)
 
+    columns = ["categories_id", "title", "release_date"]
+
+    try:
+        result = await bulk_create(
+            Game, "[gamehub].[games]", columns, games, chunk_size
+            , required=("categories_id", "title"), references={"categories_id": "[gamehub].[categories]"}
+        )
+        bump_version("games")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+    for inserted in result["inserted"]:
+        games_index.add({ **games[inserted["index"]], "id": inserted["id"] })
+    return result
 
+@traced
 async def update_game( game:Game ) -> Game:
 
     dict = game.model_dump(exclude_none=True)
@@ -134,18 +335,7 @@ async def update_game( game:Game ) -> Game:
         UPDATE [gamehub].[games]
         SET {variables}
         WHERE [id] = ?;
-    """
 
-    params = [ dict[v] for v in keys ]
-    params.append( game.id )
-
-    update_result = None
-    try:
-        update_result = await execute_query_json( updatescript, params, needs_commit=True )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-
-    sqlfind: str = """
         SELECT g.id
             , g.categories_id
             , c.name as category_name
@@ -156,20 +346,25 @@ async def update_game( game:Game ) -> Game:
         WHERE g.id = ?;
     """
 
-    params = [game.id]
+    params = [ dict[v] for v in keys ]
+    params.append( game.id )
+    params.append( game.id )
 
-    result_dict=[]
+    result_dict = []
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
-
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Game not found")
+        result_dict = await execute_query( updatescript, params, needs_commit=True )
+        games_cache.invalidate(game.id)
+        bump_version("games")
     except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Database error: { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=404, detail="Game not found")
 
+    games_index.add(result_dict[0])
+    return result_dict[0]
+
+@traced
 async def delete_game( id:int ) -> str:
 
     deletescript = """
@@ -180,48 +375,79 @@ async def delete_game( id:int ) -> str:
     params = [id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        games_cache.invalidate(id)
+        bump_version("games")
+        games_index.remove(id)
         return "DELETED"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
+
 # ============================================================
 #          GAME ↔ PLAYERS RELATION (players_games)
 # ============================================================
 
-async def get_all_players( game_id: int ) -> list[PlayerGame]:
+def _select_game_players( game_id: int, limit: int | None, cursor: str | None, registered_date_from: datetime | None, registered_date_to: datetime | None, sort: str | None, fields: str | None ) -> tuple[str, list, Keyset | None]:
+    # SQL común a get_all_players y stream_all_players
+    keys = parse_sort(sort, PLAYER_GAME_SORTS, [("pc.game_id", "game_id"), ("pc.player_id", "player_id")])
+    fields = PLAYER_GAME_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
 
-    selectscript = """
-        SELECT pc.player_id
-            ,p.nickname 
-            ,pc.game_id
-            ,g.title
-            ,pc.registered_date
+    selectscript = f"""
+        SELECT {PLAYER_GAME_FIELDS.select(fields)}
         FROM gamehub.players_games pc 
-        INNER JOIN gamehub.players p  ON pc.player_id = p.id 
-        INNER JOIN gamehub.games g ON pc.game_id = g.id
+        {PLAYER_GAME_FIELDS.join(fields)}
         WHERE pc.game_id = ?;
     """
 
-    params=[game_id]
+    filters = (
+        Filters()
+        .window("pc.registered_date", registered_date_from, registered_date_to)
+    )
+    selectscript, params = filters.apply(selectscript, [game_id], has_where=True)
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, PLAYER_GAME_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=True)
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
+    return selectscript, params, keyset
+
+@traced
+async def get_all_players( game_id: int, limit: int | None = None, cursor: str | None = None, registered_date_from: datetime | None = None, registered_date_to: datetime | None = None, sort: str | None = None, fields: str | None = None ) -> list[PlayerGame]:
+
+    selectscript, params, keyset = _select_game_players(game_id, limit, cursor, registered_date_from, registered_date_to, sort, fields)
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
-        if len(result_dict) == 0:
+        if len(result_dict) == 0 and not cursor:
             raise HTTPException(status_code=404, detail="No games found for the player")
         
+        if keyset:
+            return keyset.page(result_dict)
         return result_dict
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
+
+@traced
+async def stream_all_players( game_id: int, registered_date_from: datetime | None = None, registered_date_to: datetime | None = None, sort: str | None = None, fields: str | None = None ):
+
+    selectscript, params, _ = _select_game_players(game_id, None, None, registered_date_from, registered_date_to, sort, fields)
+
+    try:
+        return await stream_query(selectscript, params=params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
 
 # ============================================================
 #        GAME ↔ PLATFORMS RELATION (games_platforms)
 # ============================================================
 
+@traced
 async def get_one_platform( games_id: int, platforms_id:int ) -> PlayerGame:
 
     selectscript = """
@@ -240,8 +466,7 @@ async def get_one_platform( games_id: int, platforms_id:int ) -> PlayerGame:
     params = [games_id, platforms_id]
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
         if len(result_dict) == 0:
@@ -251,54 +476,105 @@ async def get_one_platform( games_id: int, platforms_id:int ) -> PlayerGame:
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
     
-async def get_all_platforms( games_id: int ) -> list[GamePlatform]:
+@traced
+async def get_all_platforms( games_id: int, limit: int | None = None, cursor: str | None = None, active: bool | None = None, sort: str | None = None, fields: str | None = None ) -> list[GamePlatform]:
 
-    selectscript = """
-        SELECT gp.games_id as game_id
-            , g.title
-            , gp.platforms_id as platform_id
-            , p.name as platform_name
-            , gp.active
+    keys = parse_sort(sort, GAME_PLATFORM_SORTS, [("gp.games_id", "game_id"), ("gp.platforms_id", "platform_id")])
+    fields = GAME_PLATFORM_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
+
+    selectscript = f"""
+        SELECT {GAME_PLATFORM_FIELDS.select(fields)}
         FROM gamehub.games_platforms gp
-        INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id 
-        INNER JOIN gamehub.games g ON gp.games_id = g.id
+        {GAME_PLATFORM_FIELDS.join(fields)}
         WHERE gp.games_id = ?;
     """
 
-    params=[games_id]
+    filters = (
+        Filters()
+        .equals("gp.active", active)
+    )
+    selectscript, params = filters.apply(selectscript, [games_id], has_where=True)
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, GAME_PLATFORM_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=True)
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
-        if len(result_dict) == 0:
+        if len(result_dict) == 0 and not cursor:
             raise HTTPException(status_code=404, detail="No platforms found for the game")
         
+        if keyset:
+            return keyset.page(result_dict)
         return result_dict
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
     
+@traced
 async def add_platform( games_id: int, platforms_id:int ) -> PlayerGame:
     
+    # INSERT y SELECT con título y plataforma en un solo lote y transacción
     createscript = """
         INSERT INTO [gamehub].[games_platforms] ( [games_id] ,[platforms_id] ,[active]) 
         VALUES ( ?, ?, ?);
+
+        SELECT gp.games_id as game_id
+            , g.title
+            , gp.platforms_id as platform_id
+            , p.name as platform_name
+            , gp.active
+        FROM gamehub.games_platforms gp
+        INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id 
+        INNER JOIN gamehub.games g ON gp.games_id = g.id
+        WHERE gp.games_id = ?
+        AND gp.platforms_id = ?;
     """
 
     params = (
         games_id
         , platforms_id
         , True
+        , games_id
+        , platforms_id
     )
 
+    result_dict = []
 
     try:
-        insert_result = await execute_query_json( createscript, params, needs_commit=True )
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        bump_version("games_platforms")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-    
-    sqlfind: str = """
+
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el registro insertado.")
+
+    return result_dict[0]
+
+@traced
+async def add_platforms( games_id: int, platforms_ids: list[int] ) -> list[GamePlatform]:
+
+    check_bulk_size(platforms_ids)
+
+    # Un solo lote: inserta los pares que faltan (los existentes se omiten) y devuelve los nuevos con sus datos
+    createscript = """
+        DECLARE @inserted TABLE ( [platforms_id] INT );
+
+        INSERT INTO [gamehub].[games_platforms] ( [games_id] ,[platforms_id] ,[active]) 
+        OUTPUT INSERTED.[platforms_id] INTO @inserted
+        SELECT ?, p.id, ?
+        FROM gamehub.platforms p
+        WHERE p.id IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) )
+        AND NOT EXISTS (
+            SELECT 1 FROM gamehub.games_platforms x
+            WHERE x.games_id = ? AND x.platforms_id = p.id
+        );
+
         SELECT gp.games_id as game_id
             , g.title
             , gp.platforms_id as platform_id
@@ -308,18 +584,26 @@ async def add_platform( games_id: int, platforms_id:int ) -> PlayerGame:
         INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id 
         INNER JOIN gamehub.games g ON gp.games_id = g.id
         WHERE gp.games_id = ?
-        AND gp.platforms_id = ?;
+        AND gp.platforms_id IN ( SELECT [platforms_id] FROM @inserted );
     """
 
-    params = [games_id, platforms_id]
+    params = (
+        games_id
+        , True
+        , json.dumps(platforms_ids)
+        , games_id
+        , games_id
+    )
 
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        return json.loads(result)[0]
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        bump_version("games_platforms")
+        return result_dict
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
 
+@traced
 async def update_platform_info(platform_data: GamePlatform) -> GamePlatform:
     dict = platform_data.model_dump(exclude_none=True)
     keys = [ k for k in  dict.keys() ]
@@ -331,18 +615,7 @@ async def update_platform_info(platform_data: GamePlatform) -> GamePlatform:
         UPDATE [gamehub].[games_platforms]
         SET {variables}
         WHERE [games_id] = ? AND [platforms_id] = ?;
-    """
-
-    params = [ dict[v] for v in keys ]
-    params.append( platform_data.games_id )
-    params.append( platform_data.platforms_id )
 
-    try:
-        await execute_query_json( updatescript, params, needs_commit=True )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-
-    select_script = """
         SELECT gp.games_id as game_id
             , g.title
             , gp.platforms_id as platform_id
@@ -355,15 +628,26 @@ async def update_platform_info(platform_data: GamePlatform) -> GamePlatform:
         AND gp.platforms_id = ?;
     """
 
-    params = [platform_data.games_id, platform_data.platforms_id]
+    params = [ dict[v] for v in keys ]
+    params.append( platform_data.games_id )
+    params.append( platform_data.platforms_id )
+    params.append( platform_data.games_id )
+    params.append( platform_data.platforms_id )
 
+    result_dict = []
     try:
-        result = await execute_query_json(select_script, params=params)
-        return json.loads(result)[0]
+        result_dict = await execute_query( updatescript, params, needs_commit=True )
+        bump_version("games_platforms")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=404, detail="No platform found for the game")
+
+    return result_dict[0]
+
 
+@traced
 async def remove_platform( games_id:int, platforms_id:int ) -> str:
 
     deletescript = """
@@ -374,7 +658,8 @@ async def remove_platform( games_id:int, platforms_id:int ) -> str:
     params = [games_id, platforms_id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        bump_version("games_platforms")
         return "PLATFORM REMOVE"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
@@ -5,64 +5,149 @@ from fastapi import HTTPException
 
 from models.platforms import Platform
 from models.games_platforms import GamePlatform
-from utils.database import execute_query_json
-
-logging.basicConfig(level=logging.INFO)
+from utils.database import execute_query, stream_query
+from utils.pagination import Keyset, apply_order
+from utils.query import Filters, Projection, parse_sort
+from utils.dataloader import DataLoader
+from utils.bulk import bulk_create, check_bulk_size
+from utils.etag import bump_version
+from utils.cache import TTLCache, MISSING, cached_get_one, cached_multi_get, reference_cache_maxsize, reference_cache_ttl
+from utils.tracing import traced
+from utils.log import setup_logging
+from controllers.games import GAME_PLATFORM_SORTS, GAME_PLATFORM_FIELDS
+
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Tabla de referencia: cambia poco y se lee constantemente
+platforms_cache = TTLCache("platforms", maxsize=reference_cache_maxsize, ttl=reference_cache_ttl)
+
+# Columnas admitidas en ?fields= : campo -> (expresión SQL, join que la aporta)
+PLATFORM_FIELDS = Projection(
+    Platform
+    , {
+        "id": ("[id]", None)
+        , "name": ("[name]", None)
+        , "release_date": ("[release_date]", None)
+    }
+)
+
 # ============================================================
 #                 CRUD OPERATIONS FOR PLATFORMS
 # ============================================================
 
-async def get_one( id:int ) -> Platform:
+async def load_many( ids: list[int] ) -> dict:
 
     selectscript = """
         SELECT [id]
             ,[name]
             ,[release_date]
         FROM [gamehub].[platforms]
-        WHERE [id] = ?
+        WHERE [id] IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) );
     """
 
-    params = [id]
-    result_dict = []
+    params = [json.dumps(ids)]
 
-    try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+    result_dict = await execute_query(selectscript, params=params)
+    return { row["id"]: row for row in result_dict }
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Platform not found")
+async def load_projection( id: int, fields: list[str] ) -> dict | None:
+
+    selectscript = f"""
+        SELECT {PLATFORM_FIELDS.select(fields)}
+        FROM [gamehub].[platforms]
+        WHERE [id] = ?;
+    """
+
+    result_dict = await execute_query(selectscript, params=[id])
+    return result_dict[0] if result_dict else None
+
+# Los get_one concurrentes de distintas peticiones se resuelven con una sola consulta
+platforms_loader = DataLoader("platforms", load_many)
+
+@traced
+async def get_one( id:int, fields: str | None = None ) -> Platform:
+
+    fields = PLATFORM_FIELDS.parse(fields)
+
+    result = None
 
+    try:
+        result = await cached_get_one(platforms_cache, lambda id: ("one", id), platforms_loader.load, id, fields, load_projection)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
+
+    #Validacion de elemento vacio
+    if result is None:
+        raise HTTPException(status_code=404, detail="Platform not found")
+    return result
+
+@traced
+async def get_many( ids: list[int] ) -> dict:
+
+    try:
+        return await cached_multi_get(platforms_cache, lambda id: ("one", id), load_many, ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
-async def get_all() -> list[Platform]:
+@traced
+async def get_all( limit: int | None = None, cursor: str | None = None, fields: str | None = None ) -> list[Platform]:
 
-    selectscript = """
-        SELECT [id]
-            ,[name]
-            ,[release_date]
+    fields = PLATFORM_FIELDS.parse(fields, ["id"] if limit is not None else [])
+
+    cache_key = ("all", limit, cursor, tuple(fields) if fields else None)
+    cached = platforms_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+
+    selectscript = f"""
+        SELECT {PLATFORM_FIELDS.select(fields)}
         FROM [gamehub].[platforms]
     """
 
+    params = []
+    keyset = None
+    if limit is not None:
+        keyset = Keyset([("[id]", "id")], limit, cursor)
+        selectscript, params = keyset.apply(selectscript, params)
+
     result_dict = []
+    generation = platforms_cache.generation
 
     try:
-        result = await execute_query_json(selectscript)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
+        if keyset:
+            result_dict = keyset.page(result_dict)
+        platforms_cache.set(cache_key, result_dict, generation)
         return result_dict
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+@traced
+async def stream_all( fields: str | None = None ):
+
+    fields = PLATFORM_FIELDS.parse(fields)
+
+    selectscript = f"""
+        SELECT {PLATFORM_FIELDS.select(fields)}
+        FROM [gamehub].[platforms]
+    """
+
+    try:
+        return await stream_query(selectscript)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
+@traced
 async def create_platform( platform: Platform ) -> Platform:
     
+    # OUTPUT devuelve la fila creada en el mismo viaje a la base de datos
     createscript = """
         INSERT INTO [gamehub].[platforms] ( [name] ,[release_date]) 
+        OUTPUT INSERTED.[id]
+            , INSERTED.[name]
+            , INSERTED.[release_date]
         VALUES ( ?, ?);
     """
 
@@ -71,36 +156,41 @@ async def create_platform( platform: Platform ) -> Platform:
         , platform.release_date
     )
 
-    insert_result = None
+    result_dict = []
 
     try:
-        insert_result = await execute_query_json( createscript, params, needs_commit=True )
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        platforms_cache.clear()
+        bump_version("platforms")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-    
-    sqlfind: str = """
-        SELECT [id]
-            ,[name]
-            ,[release_date]
-        FROM [gamehub].[platforms]
-        WHERE [name] = ?
-    """
 
-    params = [platform.name]
+    #Validacion de elemento vacio
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el registro insertado.")
 
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
+    return result_dict[0]
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            return []
+@traced
+async def create_platforms_bulk( platforms: list[dict], chunk_size: int | None = None ) -> dict:
+
+    check_bulk_size(platforms)
+
+    columns = ["name", "release_date"]
 
+    try:
+        result = await bulk_create(
+            Platform, "[gamehub].[platforms]", columns, platforms, chunk_size
+            , required=("name",)
+        )
+        if result["inserted"]:
+            platforms_cache.clear()
+        bump_version("platforms")
+        return result
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
+@traced
 async def update_platform( platform:Platform ) -> Platform:
 
     dict = platform.model_dump(exclude_none=True)
@@ -112,40 +202,29 @@ async def update_platform( platform:Platform ) -> Platform:
     updatescript = f"""
         UPDATE [gamehub].[platforms]
         SET {variables}
+        OUTPUT INSERTED.[id]
+            , INSERTED.[name]
+            , INSERTED.[release_date]
         WHERE [id] = ?;
     """
 
     params = [ dict[v] for v in keys ]
     params.append( platform.id )
 
-    update_result = None
+    result_dict = []
     try:
-        update_result = await execute_query_json( updatescript, params, needs_commit=True )
+        result_dict = await execute_query( updatescript, params, needs_commit=True )
+        platforms_cache.clear()
+        bump_version("platforms")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
-    sqlfind: str = """
-        SELECT [id]
-            ,[name]
-            ,[release_date]
-        FROM [gamehub].[platforms]
-        WHERE [id] = ?
-    """
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=404, detail="Platform not found")
 
-    params = [platform.id]
-
-    result_dict=[]
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
-
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Platform not found")
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Database error: { str(e) }")
+    return result_dict[0]
 
+@traced
 async def delete_platform( id:int ) -> str:
 
     deletescript = """
@@ -156,7 +235,9 @@ async def delete_platform( id:int ) -> str:
     params = [id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        platforms_cache.clear()
+        bump_version("platforms")
         return "DELETED"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
@@ -166,30 +247,41 @@ async def delete_platform( id:int ) -> str:
 #          PLATFORM ↔ GAMES RELATION (games_platforms)
 # ============================================================
 
-async def get_all_games( platforms_id: int ) -> list[GamePlatform]:
+@traced
+async def get_all_games( platforms_id: int, limit: int | None = None, cursor: str | None = None, active: bool | None = None, sort: str | None = None, fields: str | None = None ) -> list[GamePlatform]:
 
-    selectscript = """
-        SELECT gp.games_id as game_id
-            , g.title
-            , gp.platforms_id as platform_id
-            , p.name as platform_name
-            , gp.active
+    keys = parse_sort(sort, GAME_PLATFORM_SORTS, [("gp.platforms_id", "platform_id"), ("gp.games_id", "game_id")])
+    fields = GAME_PLATFORM_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
+
+    selectscript = f"""
+        SELECT {GAME_PLATFORM_FIELDS.select(fields)}
         FROM gamehub.games_platforms gp
-        INNER JOIN gamehub.platforms p  ON gp.platforms_id = p.id 
-        INNER JOIN gamehub.games g ON gp.games_id = g.id
+        {GAME_PLATFORM_FIELDS.join(fields)}
         WHERE gp.platforms_id = ?;
     """
 
-    params=[platforms_id]
+    filters = (
+        Filters()
+        .equals("gp.active", active)
+    )
+    selectscript, params = filters.apply(selectscript, [platforms_id], has_where=True)
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, GAME_PLATFORM_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=True)
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
-        if len(result_dict) == 0:
+        if len(result_dict) == 0 and not cursor:
             raise HTTPException(status_code=404, detail="No games found for the platform")
         
+        if keyset:
+            return keyset.page(result_dict)
         return result_dict
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
\ No newline at end of file
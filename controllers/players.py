@@ -1,25 +1,94 @@
+import asyncio
 import json
 import logging
 
 from fastapi import HTTPException
 
 from models.players import Player
-from utils.database import execute_query_json
+from utils.database import execute_query, stream_query
+from utils.pagination import Keyset, apply_order
+from utils.query import Filters, Projection, parse_sort
+from utils.dataloader import DataLoader
+from utils.bulk import bulk_create, check_bulk_size
+from utils.search import SearchIndex, search_default_limit
+from utils.etag import bump_version
+from utils.cache import TTLCache, cached_get_one, cached_multi_get, entity_cache_maxsize, entity_cache_ttl
 
 from models.players_games import PlayerGame
 
-from datetime import datetime
+from datetime import date, datetime
+from utils.tracing import traced
+from utils.log import setup_logging
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# LRU por id para el endpoint más consultado
+players_cache = TTLCache("players", maxsize=entity_cache_maxsize, ttl=entity_cache_ttl)
+
+# Columnas admitidas en ?sort= : nombre -> (expresión SQL, admite NULL)
+PLAYER_SORTS = {
+    "id": ("[id]", False)
+    , "nickname": ("[nickname]", False)
+    , "lastname": ("[lastname]", False)
+    , "birth_date": ("[birth_date]", True)
+}
+PLAYER_GAME_SORTS = {
+    "registered_date": ("pc.registered_date", True)
+    , "nickname": ("p.nickname", False)
+    , "title": ("g.title", False)
+}
+
+# Columnas admitidas en ?fields= : campo -> (expresión SQL, join que la aporta)
+PLAYER_FIELDS = Projection(
+    Player
+    , {
+        "id": ("[id]", None)
+        , "firstname": ("[firstname]", None)
+        , "lastname": ("[lastname]", None)
+        , "nickname": ("[nickname]", None)
+        , "email": ("[email]", None)
+        , "birth_date": ("[birth_date]", None)
+    }
+)
+PLAYER_GAME_FIELDS = Projection(
+    PlayerGame
+    , {
+        "player_id": ("pc.player_id", None)
+        , "nickname": ("p.nickname", "players")
+        , "game_id": ("pc.game_id", None)
+        , "title": ("g.title", "games")
+        , "registered_date": ("pc.registered_date", None)
+    }
+    , joins={
+        "players": "INNER JOIN gamehub.players p  ON pc.player_id = p.id"
+        , "games": "INNER JOIN gamehub.games g ON pc.game_id = g.id"
+    }
+    , display=("nickname", "title")
+)
+
+
+async def _load_search_rows() -> list:
+
+    selectscript = """
+        SELECT [id]
+            ,[nickname]
+            ,[firstname]
+            ,[lastname]
+        FROM [gamehub].[players];
+    """
+
+    return await execute_query(selectscript)
+
+# Índice de trigramas sobre nickname; se mantiene al día desde las escrituras de este módulo
+players_index = SearchIndex("players", "nickname", ["id", "nickname", "firstname", "lastname"], _load_search_rows)
 
 # ============================================================
 #                 CRUD OPERATIONS FOR PLAYERS
 # ============================================================
 
 
-async def get_one( id:int ) -> Player:
+async def load_many( ids: list[int] ) -> dict:
 
     selectscript = """
         SELECT [id]
@@ -29,51 +98,162 @@ async def get_one( id:int ) -> Player:
             ,[email]
             ,[birth_date]
         FROM [gamehub].[players]
+        WHERE [id] IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) );
+    """
+
+    params = [json.dumps(ids)]
+
+    result_dict = await execute_query(selectscript, params=params)
+    return { row["id"]: row for row in result_dict }
+
+async def load_projection( id: int, fields: list[str] ) -> dict | None:
+
+    selectscript = f"""
+        SELECT {PLAYER_FIELDS.select(fields)}
+        FROM [gamehub].[players]
         WHERE [id] = ?;
     """
 
-    params = [id]
-    result_dict = []
+    result_dict = await execute_query(selectscript, params=[id])
+    return result_dict[0] if result_dict else None
 
-    try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+# Los get_one concurrentes de distintas peticiones se resuelven con una sola consulta
+players_loader = DataLoader("players", load_many)
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Player not found")
+@traced
+async def get_one( id:int, fields: str | None = None ) -> Player:
 
+    fields = PLAYER_FIELDS.parse(fields)
+
+    result = None
+
+    try:
+        result = await cached_get_one(players_cache, lambda id: id, players_loader.load, id, fields, load_projection)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
+
+    #Validacion de elemento vacio
+    if result is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return result
+
+@traced
+async def get_many( ids: list[int] ) -> dict:
+
+    try:
+        return await cached_multi_get(players_cache, lambda id: id, load_many, ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+@traced
+async def search( q: str, limit: int | None = None ) -> list[dict]:
+    await players_index.ensure_loaded()
+    if not players_index.loaded:
+        raise HTTPException(status_code=503, detail="Search index is not available")
+    # La puntuación es CPU pura: fuera del event loop
+    return await asyncio.to_thread(players_index.search, q, limit or search_default_limit)
+
+# Relaciones que GET /players/{id}?include= puede incrustar
+PLAYER_INCLUDES = ("games",)
+
+@traced
+async def get_one_with( id:int, include: list[str], fields: str | None = None ) -> dict:
+
+    gamesscript = """
+        SELECT pc.player_id
+            ,p.nickname 
+            ,pc.game_id
+            ,g.title
+            ,pc.registered_date
+        FROM gamehub.players_games pc 
+        INNER JOIN gamehub.players p  ON pc.player_id = p.id 
+        INNER JOIN gamehub.games g ON pc.game_id = g.id
+        WHERE pc.player_id = ?;
+    """
+
+    scripts = {
+        "games": gamesscript
+    }
+
+    try:
+        # Cada consulta usa su propia conexión del pool y corren a la vez
+        player, *related = await asyncio.gather(
+            get_one(id, fields)
+            , *[ execute_query(scripts[name], params=[id]) for name in include ]
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+    document = dict(player)
+    for name, rows in zip(include, related):
+        document[name] = rows
+    return document
     
-async def get_all() -> list[Player]:
+def _select_players( limit: int | None, cursor: str | None, nickname: str | None, birth_date_from: date | None, birth_date_to: date | None, sort: str | None, fields: str | None ) -> tuple[str, list, Keyset | None]:
+    # SQL común a get_all y stream_all: con limit se pagina por cursor, sin él solo se ordena si se pidió
+    keys = parse_sort(sort, PLAYER_SORTS, [("[id]", "id")])
+    fields = PLAYER_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
 
-    selectscript = """
-        SELECT [id]
-            ,[firstname]
-            ,[lastname]
-            ,[nickname]
-            ,[email]
-            ,[birth_date]
+    selectscript = f"""
+        SELECT {PLAYER_FIELDS.select(fields)}
         FROM [gamehub].[players]
     """
 
+    filters = (
+        Filters()
+        .prefix("[nickname]", nickname)
+        .between("[birth_date]", birth_date_from, birth_date_to)
+    )
+    selectscript, params = filters.apply(selectscript, [])
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, PLAYER_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=bool(filters))
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
+    return selectscript, params, keyset
+
+@traced
+async def get_all( limit: int | None = None, cursor: str | None = None, nickname: str | None = None, birth_date_from: date | None = None, birth_date_to: date | None = None, sort: str | None = None, fields: str | None = None ) -> list[Player]:
+
+    selectscript, params, keyset = _select_players(limit, cursor, nickname, birth_date_from, birth_date_to, sort, fields)
+
     result_dict = []
 
     try:
-        result = await execute_query_json(selectscript)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
+        if keyset:
+            return keyset.page(result_dict)
         return result_dict
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
+
+@traced
+async def stream_all( nickname: str | None = None, birth_date_from: date | None = None, birth_date_to: date | None = None, sort: str | None = None, fields: str | None = None ):
+
+    selectscript, params, _ = _select_players(None, None, nickname, birth_date_from, birth_date_to, sort, fields)
+
+    try:
+        return await stream_query(selectscript, params=params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
+@traced
 async def create_player( player: Player ) -> Player:
     
+    # OUTPUT devuelve la fila creada en el mismo viaje a la base de datos
     createscript = """
         INSERT INTO [gamehub].[players] ( [firstname] ,[lastname] ,[nickname] ,[email] ,[birth_date]) 
+        OUTPUT INSERTED.[id]
+            , INSERTED.[firstname]
+            , INSERTED.[lastname]
+            , INSERTED.[nickname]
+            , INSERTED.[email]
+            , INSERTED.[birth_date]
         VALUES ( ?, ?, ?, ? ,? );
     """
 
@@ -85,39 +265,42 @@ async def create_player( player: Player ) -> Player:
         , player.birth_date
     )
 
-    insert_result = None
+    result_dict = []
 
     try:
-        insert_result = await execute_query_json( createscript, params, needs_commit=True )
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        bump_version("players")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-    
-    sqlfind: str = """
-        SELECT [id]
-            ,[firstname]
-            ,[lastname]
-            ,[nickname]
-            ,[email]
-            ,[birth_date]
-        FROM [gamehub].[players]
-        WHERE [nickname] = ?;
-    """
 
-    params = [player.nickname]
+    #Validacion de elemento vacio
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el registro insertado.")
 
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
+    players_index.add(result_dict[0])
+    return result_dict[0]
 
-        #Validacion de elemento vacio
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            return []
+@traced
+async def create_players_bulk( players: list[dict], chunk_size: int | None = None ) -> dict:
+
+    check_bulk_size(players)
 
+    columns = ["firstname", "lastname", "nickname", "email", "birth_date"]
+
+    try:
+        result = await bulk_create(
+            Player, "[gamehub].[players]", columns, players, chunk_size
+            , required=("nickname",), unique=[("nickname",)]
+        )
+        bump_version("players")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
+    for inserted in result["inserted"]:
+        players_index.add({ **players[inserted["index"]], "id": inserted["id"] })
+    return result
+
+@traced
 async def update_player( player:Player ) -> Player:
 
     dict = player.model_dump(exclude_none=True)
@@ -129,43 +312,33 @@ async def update_player( player:Player ) -> Player:
     updatescript = f"""
         UPDATE [gamehub].[players]
         SET {variables}
+        OUTPUT INSERTED.[id]
+            , INSERTED.[firstname]
+            , INSERTED.[lastname]
+            , INSERTED.[nickname]
+            , INSERTED.[email]
+            , INSERTED.[birth_date]
         WHERE [id] = ?;
     """
 
     params = [ dict[v] for v in keys ]
     params.append( player.id )
 
-    update_result = None
+    result_dict = []
     try:
-        update_result = await execute_query_json( updatescript, params, needs_commit=True )
+        result_dict = await execute_query( updatescript, params, needs_commit=True )
+        players_cache.invalidate(player.id)
+        bump_version("players")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
-    sqlfind: str = """
-        SELECT [id]
-            ,[firstname]
-            ,[lastname]
-            ,[nickname]
-            ,[email]
-            ,[birth_date]
-        FROM [gamehub].[players]
-        WHERE [id] = ?;
-    """
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=404, detail="Player not found")
 
-    params = [player.id]
-
-    result_dict=[]
-    try:
-        result = await execute_query_json(sqlfind, params=params)
-        result_dict = json.loads(result)
-
-        if len(result_dict) > 0:
-            return result_dict[0]
-        else:
-            raise HTTPException(status_code=404, detail="Player not found")
-    except Exception as e:
-        raise HTTPException(status_code=404, detail=f"Database error: { str(e) }")
+    players_index.add(result_dict[0])
+    return result_dict[0]
 
+@traced
 async def delete_player( id:int ) -> str:
 
     deletescript = """
@@ -176,7 +349,10 @@ async def delete_player( id:int ) -> str:
     params = [id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        players_cache.invalidate(id)
+        bump_version("players")
+        players_index.remove(id)
         return "DELETED"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
@@ -187,6 +363,7 @@ async def delete_player( id:int ) -> str:
 # ============================================================
 
 
+@traced
 async def get_one_game( player_id: int, game_id:int ) -> PlayerGame:
 
     selectscript = """
@@ -205,8 +382,7 @@ async def get_one_game( player_id: int, game_id:int ) -> PlayerGame:
     params = [player_id, game_id]
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
         if len(result_dict) == 0:
@@ -216,54 +392,120 @@ async def get_one_game( player_id: int, game_id:int ) -> PlayerGame:
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
     
-async def get_all_games( player_id: int ) -> list[PlayerGame]:
+def _select_player_games( player_id: int, limit: int | None, cursor: str | None, registered_date_from: datetime | None, registered_date_to: datetime | None, sort: str | None, fields: str | None ) -> tuple[str, list, Keyset | None]:
+    # SQL común a get_all_games y stream_all_games
+    keys = parse_sort(sort, PLAYER_GAME_SORTS, [("pc.player_id", "player_id"), ("pc.game_id", "game_id")])
+    fields = PLAYER_GAME_FIELDS.parse(fields, [key[1] for key in keys] if limit is not None or sort else [])
 
-    selectscript = """
-        SELECT pc.player_id
-            ,p.nickname 
-            ,pc.game_id
-            ,g.title
-            ,pc.registered_date
+    selectscript = f"""
+        SELECT {PLAYER_GAME_FIELDS.select(fields)}
         FROM gamehub.players_games pc 
-        INNER JOIN gamehub.players p  ON pc.player_id = p.id 
-        INNER JOIN gamehub.games g ON pc.game_id = g.id
+        {PLAYER_GAME_FIELDS.join(fields)}
         WHERE pc.player_id = ?;
     """
 
-    params=[player_id]
+    filters = (
+        Filters()
+        .window("pc.registered_date", registered_date_from, registered_date_to)
+    )
+    selectscript, params = filters.apply(selectscript, [player_id], has_where=True)
+
+    keyset = None
+    if limit is not None:
+        keyset = Keyset(keys, limit, cursor, PLAYER_GAME_FIELDS.model)
+        selectscript, params = keyset.apply(selectscript, params, has_where=True)
+    elif sort:
+        selectscript = apply_order(selectscript, keys)
+    return selectscript, params, keyset
+
+@traced
+async def get_all_games( player_id: int, limit: int | None = None, cursor: str | None = None, registered_date_from: datetime | None = None, registered_date_to: datetime | None = None, sort: str | None = None, fields: str | None = None ) -> list[PlayerGame]:
+
+    selectscript, params, keyset = _select_player_games(player_id, limit, cursor, registered_date_from, registered_date_to, sort, fields)
 
     try:
-        result = await execute_query_json(selectscript, params=params)
-        result_dict = json.loads(result)
+        result_dict = await execute_query(selectscript, params=params)
 
         #Validacion de elemento vacio
-        if len(result_dict) == 0:
+        if len(result_dict) == 0 and not cursor:
             raise HTTPException(status_code=404, detail="No games found for the player")
         
+        if keyset:
+            return keyset.page(result_dict)
         return result_dict
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Database error { str(e) }")
+
+@traced
+async def stream_all_games( player_id: int, registered_date_from: datetime | None = None, registered_date_to: datetime | None = None, sort: str | None = None, fields: str | None = None ):
+
+    selectscript, params, _ = _select_player_games(player_id, None, None, registered_date_from, registered_date_to, sort, fields)
+
+    try:
+        return await stream_query(selectscript, params=params)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
     
+@traced
 async def add_game( player_id: int, game_id:int ) -> PlayerGame:
     
+    # INSERT y SELECT con los datos del jugador y del juego en un solo lote y transacción
     createscript = """
         INSERT INTO [gamehub].[players_games] ( [player_id] ,[game_id] ,[registered_date]) 
         VALUES ( ?, ?, ?);
+
+        SELECT pc.player_id
+            ,p.nickname 
+            ,pc.game_id
+            ,g.title
+            ,pc.registered_date
+        FROM gamehub.players_games pc 
+        INNER JOIN gamehub.players p  ON pc.player_id = p.id 
+        INNER JOIN gamehub.games g ON pc.game_id = g.id
+        WHERE pc.player_id = ?
+        and pc.game_id = ?;
     """
 
     params = (
         player_id
         , game_id
         , datetime.now()
+        , player_id
+        , game_id
     )
 
+    result_dict = []
 
     try:
-        insert_result = await execute_query_json( createscript, params, needs_commit=True )
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        bump_version("players_games")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
-    
-    sqlfind: str = """
+
+    if len(result_dict) == 0:
+        raise HTTPException(status_code=500, detail="No se pudo recuperar el registro insertado.")
+
+    return result_dict[0]
+
+@traced
+async def add_games( player_id: int, game_ids: list[int] ) -> list[PlayerGame]:
+
+    check_bulk_size(game_ids)
+
+    # Un solo lote: inserta los pares que faltan (los existentes se omiten) y devuelve los nuevos con sus datos
+    createscript = """
+        DECLARE @inserted TABLE ( [game_id] INT );
+
+        INSERT INTO [gamehub].[players_games] ( [player_id] ,[game_id] ,[registered_date]) 
+        OUTPUT INSERTED.[game_id] INTO @inserted
+        SELECT ?, g.id, ?
+        FROM gamehub.games g
+        WHERE g.id IN ( SELECT CAST([value] AS INT) FROM OPENJSON(?) )
+        AND NOT EXISTS (
+            SELECT 1 FROM gamehub.players_games pg
+            WHERE pg.player_id = ? AND pg.game_id = g.id
+        );
+
         SELECT pc.player_id
             ,p.nickname 
             ,pc.game_id
@@ -273,18 +515,26 @@ async def add_game( player_id: int, game_id:int ) -> PlayerGame:
         INNER JOIN gamehub.players p  ON pc.player_id = p.id 
         INNER JOIN gamehub.games g ON pc.game_id = g.id
         WHERE pc.player_id = ?
-        and pc.game_id = ?;
+        AND pc.game_id IN ( SELECT [game_id] FROM @inserted );
     """
 
-    params = [player_id, game_id]
+    params = (
+        player_id
+        , datetime.now()
+        , json.dumps(game_ids)
+        , player_id
+        , player_id
+    )
 
     try:
-        result = await execute_query_json(sqlfind, params=params)
-        return json.loads(result)[0]
+        result_dict = await execute_query( createscript, params, needs_commit=True )
+        bump_version("players_games")
+        return result_dict
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error { str(e) }")
+        raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
 
 
+@traced
 async def remove_game( player_id:int, game_id:int ) -> str:
 
     deletescript = """
@@ -295,7 +545,8 @@ async def remove_game( player_id:int, game_id:int ) -> str:
     params = [player_id, game_id]
 
     try:
-        await execute_query_json(deletescript, params=params, needs_commit=True)
+        await execute_query(deletescript, params=params, needs_commit=True)
+        bump_version("players_games")
         return "GAME REMOVE"
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: { str(e) }")
@@ -1,23 +1,90 @@
 import uvicorn
-from fastapi import FastAPI
+from typing import Optional
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Query
+from fastapi.responses import FileResponse, PlainTextResponse
 from routes.players import router as router_player
 from routes.games import router as router_game
 from routes.categories import router as router_categories
 from routes.platforms import router as router_platforms
+from routes.batch import router as router_batch
+from utils.database import init_database, close_database
+from utils.cache import cache_stats, configure_invalidation_bus
+from utils.singleflight import single_flight_stats
+from utils.dataloader import dataloader_stats
+from utils.search import load_search_indexes, search_stats
+from utils.etag import version_stats
+from utils.metrics import MetricsMiddleware, render_metrics
+from utils.tracing import start_exporter, stop_exporter
+from utils.log import LogLevel, SqlLogMode, configure_logging, logging_settings
+from utils.diagnostics import start_diagnostics, stop_diagnostics, diagnostics_stats
+from utils.profiling import ProfilingMiddleware, list_profiles, profile_path
+from utils.admin import require_admin_token
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_exporter()
+    configure_invalidation_bus()
+    start_diagnostics()
+    await init_database()
+    await load_search_indexes()
+    yield
+    await stop_diagnostics()
+    await close_database()
+    stop_exporter()
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 
 app.include_router(router_player)
 app.include_router(router_game)
 app.include_router(router_categories)
 app.include_router(router_platforms)
+app.include_router(router_batch)
 
 
 @app.get("/")
 def read_root():
     return {"Hello": "Player"}
 
+@app.get("/stats", tags=["Stats"])
+def read_stats():
+    return {"cache": cache_stats(), "single_flight": single_flight_stats(), "dataloader": dataloader_stats(), "search": search_stats(), "versions": version_stats()}
+
+
+@app.get("/metrics", tags=["Stats"], response_class=PlainTextResponse)
+def read_metrics():
+    # Formato de exposición de texto de Prometheus
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/diagnostics", tags=["Stats"], dependencies=[Depends(require_admin_token)])
+def read_diagnostics():
+    # Retraso del event loop y bloqueos recientes con su pila, ruta y controlador
+    return diagnostics_stats()
+
+
+@app.get("/profiles", tags=["Stats"], dependencies=[Depends(require_admin_token)])
+def read_profiles( limit: int = Query(50, ge=1, le=500) ):
+    # Capturas recientes (más nuevas primero) con las funciones de más tiempo propio
+    return list_profiles(limit)
+
+@app.get("/profiles/{name}", tags=["Stats"], dependencies=[Depends(require_admin_token)])
+def download_profile( name: str ):
+    return FileResponse(profile_path(name), media_type="application/octet-stream", filename=name)
+
+
+@app.get("/logging", tags=["Stats"], dependencies=[Depends(require_admin_token)])
+def read_logging():
+    return logging_settings()
+
+@app.put("/logging", tags=["Stats"], dependencies=[Depends(require_admin_token)])
+def update_logging( sql: Optional[SqlLogMode] = None, level: Optional[LogLevel] = None ):
+    # Activa o silencia el registro de SQL sin reiniciar (p. ej. PUT /logging?sql=all)
+    return configure_logging(sql=sql, level=level)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,26 @@
+from pydantic import BaseModel, Field
+from typing import Any, Literal, Optional
+
+class BatchOperation(BaseModel):
+    method: Literal["GET", "POST", "PUT", "DELETE"] = Field(
+        default="GET",
+        description="Método HTTP de la sub-petición.",
+        examples=["GET", "POST"]
+    )
+
+    path: str = Field(
+        description="Ruta relativa a la API, con query string opcional.",
+        pattern=r"^/(players|games|platforms|categories)(/[^?#]*)?(\?[^#]*)?$",
+        examples=["/players/1", "/games/?limit=20", "/games/3?include=platforms"]
+    )
+
+    body: Optional[Any] = Field(
+        default=None,
+        description="Cuerpo JSON de la sub-petición (POST/PUT)."
+    )
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchOperation] = Field(
+        description="Sub-peticiones a ejecutar, en orden."
+    )
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Request, status
+from models.batch import BatchRequest
+
+from controllers.batch import execute_batch
+from utils.tracing import TracedRoute
+
+router = APIRouter(prefix="/batch", route_class=TracedRoute)
+
+# ============================================================
+#                  BATCHED SUB-REQUESTS
+# ============================================================
+
+@router.post("", tags=["Batch"], status_code=status.HTTP_200_OK)
+async def run_batch( request: Request, batch_data: BatchRequest ):
+    result = await execute_batch(request.app, request.scope, batch_data.requests)
+    return result
@@ -1,35 +1,54 @@
-from fastapi import APIRouter, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
 from models.categories import Category
 
 from controllers.categories import (
     get_one
     , get_all
+    , get_many
+    , stream_all
     , create_category
+    , create_categories_bulk
     , update_category
     , delete_category
 )
+from utils.responses import json_response, streaming_response, StreamMode
+from utils.pagination import max_page_size
+from utils.etag import etag_for, etag_headers
+from utils.query import parse_id_list
+from utils.tracing import TracedRoute
 
-router = APIRouter(prefix="/categories")
+router = APIRouter(prefix="/categories", route_class=TracedRoute)
 
 # ============================================================
 #                  MAIN CRUD FOR CATEGORIES
 # ============================================================
 
 @router.get("/{id}", tags=["Categories"], status_code=status.HTTP_200_OK)
-async def get_one_category( id:int ):
-    result: Category = await get_one(id)
-    return result
+async def get_one_category( id:int, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("categories")) ):
+    result: Category = await get_one(id, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.get( "/", tags=["Categories"], status_code=status.HTTP_200_OK)
-async def get_all_category():
-    result = await get_all()
-    return result
+async def get_all_category( ids: Optional[str] = None, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("categories")) ):
+    if ids is not None:
+        result = await get_many(parse_id_list(ids))
+        return json_response(result, headers=etag_headers(etag))
+    if stream and limit is None:
+        return streaming_response(await stream_all(fields), stream, headers=etag_headers(etag))
+    result = await get_all(limit, cursor, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.post( "/", tags=["Categories"], status_code=status.HTTP_201_CREATED)
 async def create_new_category(category_data: Category):
     result = await create_category(category_data)
     return result
 
+@router.post( "/bulk", tags=["Categories"], status_code=status.HTTP_201_CREATED)
+async def create_categories_in_bulk( categories_data: list[dict], chunk_size: Optional[int] = Query(default=None, ge=1) ):
+    result = await create_categories_bulk(categories_data, chunk_size)
+    return result
+
 @router.put("/{id}", tags=["Categories"], status_code=status.HTTP_201_CREATED)
 async def update_category_information( id:int, category_data:Category ):
     category_data.id = id
@@ -1,44 +1,79 @@
-from fastapi import APIRouter, status
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
 from models.games import Game
 from models.games_platforms import GamePlatform
 
 from controllers.games import (
     get_one
     , get_all
+    , get_many
+    , get_one_with
+    , search
+    , GAME_INCLUDES
+    , stream_all
     , create_game
+    , create_games_bulk
     , update_game
     , delete_game
     # players_games
     , get_all_players
+    , stream_all_players
     # games_platforms
     , get_one_platform
     , get_all_platforms
     , add_platform
+    , add_platforms
     , update_platform_info
     , remove_platform
 )
+from utils.responses import json_response, streaming_response, StreamMode
+from utils.pagination import max_page_size
+from utils.etag import etag_for, etag_headers
+from utils.search import search_max_limit, search_min_length
+from utils.query import parse_id_list, parse_include
+from utils.tracing import TracedRoute
 
-router = APIRouter(prefix="/games")
+router = APIRouter(prefix="/games", route_class=TracedRoute)
 
 # ============================================================
 #                    MAIN CRUD FOR GAMES
 # ============================================================
 
+# Debe registrarse antes de "/{id}" para que "search" no se interprete como id
+@router.get("/search", tags=["Games"], status_code=status.HTTP_200_OK)
+async def search_games( q: str = Query(min_length=search_min_length), limit: Optional[int] = Query(default=None, ge=1, le=search_max_limit) ):
+    result = await search(q, limit)
+    return json_response(result)
+
 @router.get("/{id}", tags=["Games"], status_code=status.HTTP_200_OK)
-async def get_one_game( id:int ):
-    result: Game = await get_one(id)
-    return result
+async def get_one_game( id:int, include: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("games", "categories", "players", "players_games", "platforms", "games_platforms")) ):
+    if include:
+        result = await get_one_with(id, parse_include(include, GAME_INCLUDES), fields)
+        return json_response(result, headers=etag_headers(etag))
+    result: Game = await get_one(id, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.get( "/", tags=["Games"], status_code=status.HTTP_200_OK)
-async def get_all_games():
-    result = await get_all()
-    return result
+async def get_all_games( ids: Optional[str] = None, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, categories_id: Optional[int] = None, release_date_from: Optional[date] = None, release_date_to: Optional[date] = None, title: Optional[str] = None, sort: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("games", "categories")) ):
+    if ids is not None:
+        result = await get_many(parse_id_list(ids))
+        return json_response(result, headers=etag_headers(etag))
+    if stream and limit is None:
+        return streaming_response(await stream_all(categories_id, release_date_from, release_date_to, title, sort, fields), stream, headers=etag_headers(etag))
+    result = await get_all(limit, cursor, categories_id, release_date_from, release_date_to, title, sort, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.post( "/", tags=["Games"], status_code=status.HTTP_201_CREATED)
 async def create_new_game(game_data: Game):
     result = await create_game(game_data)
     return result
 
+@router.post( "/bulk", tags=["Games"], status_code=status.HTTP_201_CREATED)
+async def create_games_in_bulk( games_data: list[dict], chunk_size: Optional[int] = Query(default=None, ge=1) ):
+    result = await create_games_bulk(games_data, chunk_size)
+    return result
+
 @router.put("/{id}", tags=["Games"], status_code=status.HTTP_201_CREATED)
 async def update_game_information( id:int, game_data:Game ):
     game_data.id = id
@@ -55,9 +90,11 @@ async def delete_game_information( id:int ):
 # ============================================================
 
 @router.get( "/{id}/players", tags=["Games"], status_code=status.HTTP_200_OK)
-async def get_all_players_of_game( id:int ):
-    result = await get_all_players(id)
-    return result
+async def get_all_players_of_game( id:int, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, registered_date_from: Optional[datetime] = None, registered_date_to: Optional[datetime] = None, sort: Optional[str] = None, fields: Optional[str] = None ):
+    if stream and limit is None:
+        return streaming_response(await stream_all_players(id, registered_date_from, registered_date_to, sort, fields), stream)
+    result = await get_all_players(id, limit, cursor, registered_date_from, registered_date_to, sort, fields)
+    return json_response(result)
 
 # ============================================================
 #            GAME → PLATFORMS RELATION (games_platforms)
@@ -66,18 +103,24 @@ async def get_all_players_of_game( id:int ):
 @router.get("/{id}/platforms/{platforms_id}", tags=["Games"], status_code=status.HTTP_200_OK)
 async def get_one_platform_of_game( id:int, platforms_id:int ):
     result = await get_one_platform(id, platforms_id)
-    return result
+    return json_response(result)
 
 @router.get( "/{id}/platforms", tags=["Games"], status_code=status.HTTP_200_OK)
-async def get_all_platforms_of_game( id:int ):
-    result = await get_all_platforms(id)
-    return result
+async def get_all_platforms_of_game( id:int, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, active: Optional[bool] = None, sort: Optional[str] = None, fields: Optional[str] = None ):
+    result = await get_all_platforms(id, limit, cursor, active, sort, fields)
+    return json_response(result)
 
 @router.post( "/{id}/platforms", tags=["Games"], status_code=status.HTTP_201_CREATED)
 async def assing_platform_to_game( id:int, platform_data: GamePlatform ):
     result = await add_platform(id, platform_data.platforms_id)
     return result
 
+@router.post( "/{id}/platforms/bulk", tags=["Games"], status_code=status.HTTP_201_CREATED)
+async def assing_platforms_to_game( id:int, platforms_data: list[GamePlatform] ):
+    platforms_ids = [ platform.platforms_id for platform in platforms_data if platform.platforms_id is not None ]
+    result = await add_platforms(id, platforms_ids)
+    return result
+
 @router.delete("/{id}/platforms/{platforms_id}", tags=["Games"], status_code=status.HTTP_204_NO_CONTENT)
 async def remove_platform_of_game( id:int, platforms_id:int ):
     status: str = await remove_platform( id, platforms_id)
@@ -1,38 +1,57 @@
-from fastapi import APIRouter, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
 from models.platforms import Platform
 
 
 from controllers.platforms import (
     get_one
     , get_all
+    , get_many
+    , stream_all
     , create_platform
+    , create_platforms_bulk
     , update_platform
     , delete_platform
     #game_platform
     , get_all_games
 )
+from utils.responses import json_response, streaming_response, StreamMode
+from utils.pagination import max_page_size
+from utils.etag import etag_for, etag_headers
+from utils.query import parse_id_list
+from utils.tracing import TracedRoute
 
-router = APIRouter(prefix="/platforms")
+router = APIRouter(prefix="/platforms", route_class=TracedRoute)
 
 # ============================================================
 #                   MAIN CRUD FOR PLATFORMS
 # ============================================================
 
 @router.get("/{id}", tags=["Platforms"], status_code=status.HTTP_200_OK)
-async def get_one_platform( id:int ):
-    result: Platform = await get_one(id)
-    return result
+async def get_one_platform( id:int, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("platforms")) ):
+    result: Platform = await get_one(id, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.get( "/", tags=["Platforms"], status_code=status.HTTP_200_OK)
-async def get_all_platforms():
-    result = await get_all()
-    return result
+async def get_all_platforms( ids: Optional[str] = None, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("platforms")) ):
+    if ids is not None:
+        result = await get_many(parse_id_list(ids))
+        return json_response(result, headers=etag_headers(etag))
+    if stream and limit is None:
+        return streaming_response(await stream_all(fields), stream, headers=etag_headers(etag))
+    result = await get_all(limit, cursor, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.post( "/", tags=["Platforms"], status_code=status.HTTP_201_CREATED)
 async def create_new_platfom(platform_data: Platform):
     result = await create_platform(platform_data)
     return result
 
+@router.post( "/bulk", tags=["Platforms"], status_code=status.HTTP_201_CREATED)
+async def create_platforms_in_bulk( platforms_data: list[dict], chunk_size: Optional[int] = Query(default=None, ge=1) ):
+    result = await create_platforms_bulk(platforms_data, chunk_size)
+    return result
+
 @router.put("/{id}", tags=["Platforms"], status_code=status.HTTP_201_CREATED)
 async def update_platform_information( id:int, platform_data:Platform ):
     platform_data.id = id
@@ -49,10 +68,10 @@ async def delete_platform_information( id:int ):
 #           PLATFORM → GAMES RELATION (games_platforms)
 # ============================================================
 
-@router.get( "/{platforms_id}/games", tags=["Platforms"], status_code=status.HTTP_200_OK)
-async def get_all_games_of_platform( id:int ):
-    result = await get_all_games(id)
-    return result
+@router.get( "/{id}/games", tags=["Platforms"], status_code=status.HTTP_200_OK)
+async def get_all_games_of_platform( id:int, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, active: Optional[bool] = None, sort: Optional[str] = None, fields: Optional[str] = None ):
+    result = await get_all_games(id, limit, cursor, active, sort, fields)
+    return json_response(result)
 
 
 
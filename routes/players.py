@@ -1,4 +1,6 @@
-from fastapi import APIRouter, status
+from datetime import date, datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, status
 
 from models.players import Player
 from models.players_games import PlayerGame
@@ -6,38 +8,71 @@ from models.players_games import PlayerGame
 from controllers.players import (
     get_one
     , get_all
+    , get_many
+    , get_one_with
+    , search
+    , PLAYER_INCLUDES
+    , stream_all
     , create_player
+    , create_players_bulk
     , update_player
     , delete_player
     #PLAYER_GAMES
     , get_one_game
     , get_all_games
+    , stream_all_games
     , add_game
+    , add_games
     , remove_game
 )
+from utils.responses import json_response, streaming_response, StreamMode
+from utils.pagination import max_page_size
+from utils.etag import etag_for, etag_headers
+from utils.search import search_max_limit, search_min_length
+from utils.query import parse_id_list, parse_include
+from utils.tracing import TracedRoute
 
 
-router = APIRouter(prefix="/players")
+router = APIRouter(prefix="/players", route_class=TracedRoute)
 
 # ============================================================
 #                    MAIN CRUD FOR PLAYERS
 # ============================================================
 
+# Debe registrarse antes de "/{id}" para que "search" no se interprete como id
+@router.get("/search", tags=["Players"], status_code=status.HTTP_200_OK)
+async def search_players( q: str = Query(min_length=search_min_length), limit: Optional[int] = Query(default=None, ge=1, le=search_max_limit) ):
+    result = await search(q, limit)
+    return json_response(result)
+
 @router.get("/{id}", tags=["Players"], status_code=status.HTTP_200_OK)
-async def get_one_player( id:int ):
-    result: Player = await get_one(id)
-    return result
+async def get_one_player( id:int, include: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("players", "players_games", "games")) ):
+    if include:
+        result = await get_one_with(id, parse_include(include, PLAYER_INCLUDES), fields)
+        return json_response(result, headers=etag_headers(etag))
+    result: Player = await get_one(id, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.get( "/", tags=["Players"], status_code=status.HTTP_200_OK)
-async def get_all_players():
-    result = await get_all()
-    return result
+async def get_all_players( ids: Optional[str] = None, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, nickname: Optional[str] = None, birth_date_from: Optional[date] = None, birth_date_to: Optional[date] = None, sort: Optional[str] = None, fields: Optional[str] = None, etag: Optional[str] = Depends(etag_for("players")) ):
+    if ids is not None:
+        result = await get_many(parse_id_list(ids))
+        return json_response(result, headers=etag_headers(etag))
+    if stream and limit is None:
+        return streaming_response(await stream_all(nickname, birth_date_from, birth_date_to, sort, fields), stream, headers=etag_headers(etag))
+    result = await get_all(limit, cursor, nickname, birth_date_from, birth_date_to, sort, fields)
+    return json_response(result, headers=etag_headers(etag))
 
 @router.post( "/", tags=["Players"], status_code=status.HTTP_201_CREATED)
 async def create_new_player(player_data: Player):
     result = await create_player(player_data)
     return result
 
+@router.post( "/bulk", tags=["Players"], status_code=status.HTTP_201_CREATED)
+async def create_players_in_bulk( players_data: list[dict], chunk_size: Optional[int] = Query(default=None, ge=1) ):
+    result = await create_players_bulk(players_data, chunk_size)
+    return result
+
 @router.put("/{id}", tags=["Players"], status_code=status.HTTP_201_CREATED)
 async def update_player_information( id:int, player_data:Player ):
     player_data.id = id
@@ -56,18 +91,26 @@ async def delete_player_content( id:int ):
 @router.get("/{id}/games/{game_id}", tags=["Players"], status_code=status.HTTP_200_OK)
 async def get_one_game_of_player( id:int, game_id:int ):
     result = await get_one_game(id, game_id)
-    return result
+    return json_response(result)
 
 @router.get( "/{id}/games", tags=["Players"], status_code=status.HTTP_200_OK)
-async def get_all_games_of_player( id:int ):
-    result = await get_all_games(id)
-    return result
+async def get_all_games_of_player( id:int, stream: Optional[StreamMode] = None, limit: Optional[int] = Query(default=None, ge=1, le=max_page_size), cursor: Optional[str] = None, registered_date_from: Optional[datetime] = None, registered_date_to: Optional[datetime] = None, sort: Optional[str] = None, fields: Optional[str] = None ):
+    if stream and limit is None:
+        return streaming_response(await stream_all_games(id, registered_date_from, registered_date_to, sort, fields), stream)
+    result = await get_all_games(id, limit, cursor, registered_date_from, registered_date_to, sort, fields)
+    return json_response(result)
 
 @router.post( "/{id}/games", tags=["Players"], status_code=status.HTTP_201_CREATED)
 async def assing_game_to_player( id:int, game_data: PlayerGame ):
     result = await add_game(id, game_data.game_id)
     return result
 
+@router.post( "/{id}/games/bulk", tags=["Players"], status_code=status.HTTP_201_CREATED)
+async def assing_games_to_player( id:int, games_data: list[PlayerGame] ):
+    game_ids = [ game.game_id for game in games_data if game.game_id is not None ]
+    result = await add_games(id, game_ids)
+    return result
+
 @router.delete("/{id}/games/{game_id}", tags=["Players"], status_code=status.HTTP_204_NO_CONTENT)
 async def remove_game_of_player( id:int, game_id:int ):
     status: str = await remove_game( id, game_id)
@@ -0,0 +1,75 @@
+import threading
+
+
+class FakeCursor:
+    # Devuelve las filas de FakeConnection.results según la plantilla ejecutada
+
+    def __init__( self, connection ):
+        self.connection = connection
+        self.description = None
+        self._rows = []
+        self.fast_executemany = False
+
+    def execute( self, sql, *params ):
+        self.connection.executed.append((sql, params))
+        self.description = None
+        self._rows = []
+        for fragment, (columns, rows) in self.connection.results.items():
+            if fragment in sql:
+                self.description = [ (column, None) for column in columns ]
+                self._rows = [ tuple(row) for row in rows() ] if callable(rows) else list(rows)
+                break
+        return self
+
+    def setinputsizes( self, sizes ):
+        self.connection.executed.append(("setinputsizes", sizes))
+
+    def executemany( self, sql, rows ):
+        self.connection.executed.append((sql, list(rows)))
+
+    def fetchall( self ):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchmany( self, size ):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def nextset( self ):
+        return False
+
+    def close( self ):
+        pass
+
+
+class FakeConnection:
+
+    def __init__( self, results: dict ):
+        self.results = results
+        self.executed = []
+        self.closed = False
+
+    def cursor( self ):
+        return FakeCursor(self)
+
+    def commit( self ):
+        pass
+
+    def rollback( self ):
+        pass
+
+    def close( self ):
+        self.closed = True
+
+
+def fake_connector( results: dict ):
+    lock = threading.Lock()
+    connections = []
+
+    def connect():
+        with lock:
+            connection = FakeConnection(results)
+            connections.append(connection)
+            return connection
+    connect.connections = connections
+    return connect
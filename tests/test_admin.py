@@ -0,0 +1,32 @@
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+from utils import admin
+from utils.admin import require_admin_token
+
+
+class AdminTokenTest(unittest.IsolatedAsyncioTestCase):
+
+    async def status( self, header ):
+        try:
+            await require_admin_token(header)
+        except HTTPException as e:
+            return e.status_code
+        return 200
+
+    async def test_closed_without_configured_token(self):
+        with mock.patch.object(admin, "admin_token", ""):
+            self.assertEqual(await self.status(None), 404)
+            self.assertEqual(await self.status(""), 404)
+
+    async def test_token_must_match(self):
+        with mock.patch.object(admin, "admin_token", "secret"):
+            self.assertEqual(await self.status(None), 403)
+            self.assertEqual(await self.status("other"), 403)
+            self.assertEqual(await self.status("secret"), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
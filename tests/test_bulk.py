@@ -0,0 +1,70 @@
+import unittest
+
+import pyodbc
+
+from models.players import Player
+from utils import database
+from utils.bulk import bulk_create, validate_rows
+from tests.test_database import DatabaseTestCase
+
+
+class ValidateRowsTest(unittest.TestCase):
+
+    def test_required_columns_are_reported_by_index(self):
+        rows, positions, errors = validate_rows(Player, [{}, {"nickname": "neo"}], ["nickname"], required=("nickname",))
+        self.assertEqual(rows, [("neo",)])
+        self.assertEqual(positions, [1])
+        self.assertEqual(errors, [{"index": 0, "errors": [{"type": "missing", "loc": ["nickname"], "msg": "Field required"}]}])
+
+
+class BulkRejectionTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        database._table_columns.clear()
+        self.addCleanup(database._table_columns.clear)
+
+    async def test_constraint_violations_are_set_aside_before_the_merge(self):
+        # Posiciones 0, 2 y 3 llegan a la base como row_index 0, 1 y 2; la 3 repite un nickname
+        self.results["FROM #bulk_rejected ORDER BY"] = (["row_index", "kind", "columns"], [(2, "unique", "nickname")])
+        self.results["MERGE INTO"] = (["row_index", "id"], [(0, 100), (1, 101)])
+        items = [ {"nickname": "neo"}, {"firstname": "sin nickname"}, {"nickname": "trinity"}, {"nickname": "neo"} ]
+
+        result = await bulk_create(Player, "[gamehub].[players]", ["nickname"], items, required=("nickname",), unique=[("nickname",)])
+
+        self.assertEqual(result["inserted"], [{"index": 0, "id": 100}, {"index": 2, "id": 101}])
+        self.assertEqual([ error["index"] for error in result["errors"] ], [1, 3])
+        self.assertEqual(result["errors"][1]["errors"], [{"type": "unique", "loc": ["nickname"], "msg": "Value already exists"}])
+
+        executed = [ sql for connection in self.connections() for sql, _ in connection.executed ]
+        merge = next(index for index, sql in enumerate(executed) if "MERGE INTO" in sql)
+        delete = next(index for index, sql in enumerate(executed) if sql.startswith("DELETE s FROM #bulk_staging"))
+        self.assertLess(delete, merge)
+
+    async def test_not_null_columns_are_checked_per_row_with_declared_parameter_types(self):
+        # email es NOT NULL en esta tabla y no está en required=: el NULL se aparta por fila
+        self.results["FROM sys.columns"] = (
+            ["name", "type_name", "max_length", "precision", "scale", "is_nullable"]
+            , [("nickname", "nvarchar", 100, 0, 0, False), ("email", "nvarchar", -1, 0, 0, False), ("birth_date", "date", 3, 10, 0, True)]
+        )
+        self.results["FROM #bulk_rejected ORDER BY"] = (["row_index", "kind", "columns"], [(1, "not_null", "email")])
+        self.results["MERGE INTO"] = (["row_index", "id"], [(0, 100)])
+        items = [ {"nickname": "neo", "email": "neo@zion.io"}, {"nickname": "trinity"} ]
+
+        result = await bulk_create(Player, "[gamehub].[players]", ["nickname", "email", "birth_date"], items, required=("nickname",))
+
+        self.assertEqual(result["inserted"], [{"index": 0, "id": 100}])
+        self.assertEqual(result["errors"], [{"index": 1, "errors": [{"type": "not_null", "loc": ["email"], "msg": "Field required"}]}])
+
+        executed = [ sql for connection in self.connections() for sql, _ in connection.executed ]
+        staging = next(sql for sql in executed if "INTO #bulk_staging" in sql and "SELECT TOP 0" in sql)
+        self.assertIn("LEFT JOIN [gamehub].[players] t ON 1 = 0", staging)
+        self.assertTrue(any("s.[email] IS NULL" in sql for sql in executed))
+        self.assertFalse(any("s.[birth_date] IS NULL" in sql for sql in executed))
+
+        sizes = [ params for connection in self.connections() for sql, params in connection.executed if sql == "setinputsizes" ]
+        self.assertEqual(sizes, [[(pyodbc.SQL_INTEGER, 0, 0), (pyodbc.SQL_WVARCHAR, 50, 0), (pyodbc.SQL_WVARCHAR, 0, 0), (pyodbc.SQL_TYPE_DATE, 10, 0)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+
+from utils.cache import CacheNode, InvalidationBus, LocalInvalidationBus, MISSING, TTLCache, cached_get_one
+
+
+class InvalidationBusTest(unittest.TestCase):
+
+    def setUp(self):
+        # Dos "workers" con la misma caché, conectados por el bus en memoria
+        self.bus = LocalInvalidationBus()
+        self.first_node = CacheNode("first")
+        self.second_node = CacheNode("second")
+        self.first_node.attach(self.bus)
+        self.second_node.attach(self.bus)
+        self.first = TTLCache("players", node=self.first_node)
+        self.second = TTLCache("players", node=self.second_node)
+
+    def test_invalidate_reaches_the_other_worker(self):
+        self.first.set(5, "old")
+        self.second.set(5, "old")
+
+        self.first.invalidate(5)
+        self.assertIs(self.second.get(5), MISSING)
+
+        self.first.set(5, "new")
+        self.second.invalidate(5)
+        self.assertIs(self.first.get(5), MISSING)
+
+    def test_clear_and_tuple_keys(self):
+        self.first.set(("all", 10), "page")
+        self.second.set(("all", 10), "page")
+        self.second.set(("all", 20), "page")
+
+        self.first.invalidate(("all", 10))
+        self.assertIs(self.second.get(("all", 10)), MISSING)
+        self.assertEqual(self.second.get(("all", 20)), "page")
+
+        self.first.clear()
+        self.assertIs(self.second.get(("all", 20)), MISSING)
+
+    def test_remote_invalidation_is_not_rebroadcast(self):
+        self.first.invalidate(5)
+        # El receptor invalida sin volver a publicar
+        self.assertEqual(self.bus.published, 1)
+
+    def test_bus_contract_is_abstract(self):
+        with self.assertRaises(TypeError):
+            InvalidationBus()
+
+
+class CachedGetOneTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = TTLCache("players", node=CacheNode("test"))
+        self.loaded = []
+
+    async def load( self, id ):
+        self.loaded.append(id)
+        return {"id": id, "nickname": "neo"} if id != 404 else None
+
+    async def load_projection( self, id, fields ):
+        return {"nickname": "projected"}
+
+    async def get( self, id, fields=None ):
+        return await cached_get_one(self.cache, lambda id: ("one", id), self.load, id, fields, self.load_projection)
+
+    async def test_full_rows_are_cached_and_misses_are_not(self):
+        self.assertEqual(await self.get(1), {"id": 1, "nickname": "neo"})
+        self.assertEqual(await self.get(1), {"id": 1, "nickname": "neo"})
+        self.assertIsNone(await self.get(404))
+        self.assertIsNone(await self.get(404))
+        self.assertEqual(self.loaded, [1, 404, 404])
+
+    async def test_projection_skips_cache_and_loader(self):
+        self.assertEqual(await self.get(1, ["nickname"]), {"nickname": "projected"})
+        self.assertEqual(self.loaded, [])
+        self.assertIs(self.cache.get(("one", 1)), MISSING)
+
+    async def test_row_read_before_an_invalidation_is_not_cached(self):
+        async def racing( id ):
+            # Una escritura invalida mientras la carga está en vuelo
+            self.cache.invalidate(("one", id))
+            return {"id": id, "nickname": "old"}
+
+        self.assertEqual(await cached_get_one(self.cache, lambda id: ("one", id), racing, 1), {"id": 1, "nickname": "old"})
+        self.assertIs(self.cache.get(("one", 1)), MISSING)
+
+
+if __name__ == "__main__":
+    unittest.main()
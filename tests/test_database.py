@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from utils import database
+from utils.database import ConnectionPool, PoolTimeoutError
+from tests.fakes import fake_connector
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    # Pool y executor propios por prueba, sobre conexiones falsas
+
+    pool_size = 2
+    stream_connections = 1
+
+    async def asyncSetUp(self):
+        self.results = {}
+        self.saved = {
+            name: getattr(database, name)
+            for name in ("pool", "pool_max_size", "pool_timeout", "executor_workers", "stream_max_connections", "single_flight_enabled")
+        }
+        self.connector = fake_connector(self.results)
+        database.pool = ConnectionPool(self.connector, min_size=0, max_size=self.pool_size, timeout=3.0)
+        database.pool_max_size = self.pool_size
+        database.pool_timeout = 3.0
+        database.executor_workers = self.pool_size
+        database.stream_max_connections = self.stream_connections
+        await database.init_database()
+
+    def connections(self):
+        return self.connector.connections
+
+    async def asyncTearDown(self):
+        await database.close_database()
+        for name, value in self.saved.items():
+            setattr(database, name, value)
+
+
+class StreamStarvationTest(DatabaseTestCase):
+
+    async def test_reads_progress_while_streams_hold_connections(self):
+        self.results["FROM streamed"] = (["id"], [ (i,) for i in range(10) ])
+        self.results["FROM first"] = (["id"], [(1,)])
+        self.results["FROM second"] = (["id"], [(2,)])
+
+        first_stream = await database.stream_query("SELECT id FROM streamed", batch_size=4)
+        # El segundo stream espera su turno en el loop, sin ocupar un hilo ni una conexión
+        second_stream = asyncio.create_task(database.stream_query("SELECT id FROM streamed", batch_size=4))
+        await asyncio.sleep(0.05)
+        self.assertFalse(second_stream.done())
+
+        first, second = await asyncio.wait_for(asyncio.gather(
+            database.execute_query("SELECT id FROM first")
+            , database.execute_query("SELECT id FROM second")
+        ), timeout=1.0)
+        self.assertEqual(first[0]["id"], 1)
+        self.assertEqual(second[0]["id"], 2)
+
+        rows = [ row["id"] async for batch in first_stream for row in batch ]
+        self.assertEqual(rows, list(range(10)))
+
+        stream = await asyncio.wait_for(second_stream, timeout=1.0)
+        rows = [ row["id"] async for batch in stream for row in batch ]
+        self.assertEqual(len(rows), 10)
+
+    async def test_waiting_for_a_connection_times_out_on_the_loop(self):
+        self.results["FROM streamed"] = (["id"], [(1,)])
+        database.pool_timeout = 0.2
+        database.stream_max_connections = 2
+        database._reset_slots()
+
+        streams = [ await database.stream_query("SELECT id FROM streamed") for _ in range(2) ]
+        with self.assertRaises(PoolTimeoutError):
+            await database.execute_query("SELECT id FROM streamed")
+        for stream in streams:
+            stream.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import asyncio
+import unittest
+
+from utils import dataloader
+from utils.dataloader import DataLoader
+
+
+class DataLoaderTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.addCleanup(dataloader._loaders.pop, "test_games", None)
+
+    async def load_titles( self, ids ):
+        self.calls.append(ids)
+        await asyncio.sleep(0)
+        return { id: f"game {id}" for id in ids if id != 404 }
+
+    async def test_keys_in_the_same_tick_share_one_batch(self):
+        loader = DataLoader("test_games", self.load_titles, tick=0.01)
+
+        results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), loader.load(404))
+
+        self.assertEqual(results, ["game 1", "game 2", "game 1", None])
+        self.assertEqual(self.calls, [[1, 2, 404]])
+
+        # Una carga posterior abre un lote nuevo
+        self.assertEqual(await loader.load(3), "game 3")
+        self.assertEqual(self.calls[1:], [[3]])
+
+    async def test_full_batch_dispatches_without_waiting_for_the_tick(self):
+        loader = DataLoader("test_games", self.load_titles, tick=60, max_batch_size=2)
+        results = await asyncio.wait_for(asyncio.gather(loader.load(1), loader.load(2)), timeout=1.0)
+        self.assertEqual(results, ["game 1", "game 2"])
+
+    async def test_failure_reaches_every_waiter(self):
+        async def failing( ids ):
+            self.calls.append(ids)
+            raise RuntimeError("connection lost")
+
+        loader = DataLoader("test_games", failing, tick=0.01)
+        results = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1), return_exceptions=True)
+
+        self.assertEqual(self.calls, [[1, 2]])
+        self.assertEqual(len(results), 3)
+        for result in results:
+            self.assertIsInstance(result, RuntimeError)
+            self.assertEqual(str(result), "connection lost")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from utils import etag
+from utils.etag import bump_version, etag_for
+
+
+def request( path: str, query: str = "", if_none_match: str | None = None ) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode("latin-1"))] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query.encode("latin-1"), "headers": headers})
+
+
+class EtagTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(etag, "invalidation_bus_configured", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dependency = etag_for("test_games", "test_categories")
+
+    async def test_matching_tag_answers_304(self):
+        tag = await self.dependency(request("/games", "limit=5&sort=title"))
+        self.assertIsNotNone(tag)
+        # El orden de los parámetros no cambia el ETag; W/ se compara de forma débil
+        with self.assertRaises(HTTPException) as raised:
+            await self.dependency(request("/games", "sort=title&limit=5", f"W/{tag}"))
+        self.assertEqual(raised.exception.status_code, 304)
+        self.assertEqual(raised.exception.headers, {"ETag": tag})
+
+        self.assertEqual(await self.dependency(request("/games", "limit=5&sort=title", '"other"')), tag)
+
+    async def test_writes_change_the_tag(self):
+        tag = await self.dependency(request("/games"))
+        bump_version("test_categories", broadcast=False)
+        new_tag = await self.dependency(request("/games", if_none_match=tag))
+        self.assertNotEqual(new_tag, tag)
+
+    async def test_no_tag_without_invalidation_bus(self):
+        with mock.patch.object(etag, "invalidation_bus_configured", return_value=False):
+            self.assertIsNone(await self.dependency(request("/games")))
+
+
+if __name__ == "__main__":
+    unittest.main()
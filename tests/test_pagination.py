@@ -0,0 +1,95 @@
+import base64
+import datetime
+import itertools
+import json
+import random
+import sqlite3
+import unittest
+
+from fastapi import HTTPException
+
+from models.players_games import PlayerGame
+from utils.pagination import Keyset, encode_cursor, order_by
+
+
+class KeysetAgainstSqliteTest(unittest.TestCase):
+    # SQLite ordena los NULL igual que SQL Server (primero en ASC, al final en DESC):
+    # recorrer todas las páginas debe dar exactamente el ORDER BY completo
+
+    def setUp(self):
+        generator = random.Random(7)
+        self.db = sqlite3.connect(":memory:")
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a INTEGER NULL, b TEXT NULL)")
+        rows = [
+            (id, generator.choice([None, 1, 2, 3]), generator.choice([None, "x", "y"]))
+            for id in range(1, 61)
+        ]
+        self.db.executemany("INSERT INTO t (id, a, b) VALUES (?, ?, ?)", rows)
+
+    def tearDown(self):
+        self.db.close()
+
+    def fetch( self, sql, params ):
+        # Misma consulta, con la sintaxis de paginación de SQLite
+        sql = sql.replace("OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY", "LIMIT ?")
+        return [ dict(row) for row in self.db.execute(sql, params) ]
+
+    def walk( self, keys, limit ):
+        seen = []
+        cursor = None
+        while True:
+            keyset = Keyset(keys, limit, cursor)
+            sql, params = keyset.apply("SELECT id, a, b FROM t", [])
+            page = keyset.page(self.fetch(sql, params))
+            seen += [ row["id"] for row in page["items"] ]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return seen
+
+    def test_every_direction_and_null_placement(self):
+        for a_descending, b_descending, id_descending in itertools.product((False, True), repeat=3):
+            keys = [("a", "a", a_descending, True), ("b", "b", b_descending, True), ("id", "id", id_descending, False)]
+            expected = [ row["id"] for row in self.fetch(f"SELECT id FROM t ORDER BY {order_by(keys)}", []) ]
+            for limit in (1, 4, 7, 60, 100):
+                with self.subTest(keys=keys, limit=limit):
+                    self.assertEqual(self.walk(keys, limit), expected)
+
+    def test_filtered_query_keeps_its_where(self):
+        keys = [("b", "b", True, True), ("id", "id", False, False)]
+        keyset = Keyset(keys, 3, None)
+        sql, params = keyset.apply("SELECT id, a, b FROM t WHERE a = ?", [2], has_where=True)
+        first = keyset.page(self.fetch(sql, params))
+
+        keyset = Keyset(keys, 100, first["next_cursor"])
+        sql, params = keyset.apply("SELECT id, a, b FROM t WHERE a = ?", [2], has_where=True)
+        rest = keyset.page(self.fetch(sql, params))
+
+        expected = [ row["id"] for row in self.fetch(f"SELECT id FROM t WHERE a = 2 ORDER BY {order_by(keys)}", []) ]
+        self.assertEqual([ row["id"] for row in first["items"] + rest["items"] ], expected)
+        self.assertIsNone(rest["next_cursor"])
+
+
+class CursorValuesTest(unittest.TestCase):
+
+    def test_dates_round_trip_with_their_type(self):
+        registered = datetime.datetime(2025, 2, 1, 14, 30, 0, 997000)
+        cursor = encode_cursor([registered, 7])
+        # Milisegundos en ISO: lo que DATETIME acepta al convertir
+        self.assertEqual(json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))), ["2025-02-01T14:30:00.997", 7])
+
+        keyset = Keyset([("pc.registered_date", "registered_date", True, True), ("pc.game_id", "game_id")], 10, cursor, PlayerGame)
+        self.assertEqual(keyset.after, [registered, 7])
+        _, params = keyset.apply("SELECT * FROM gamehub.players_games pc", [])
+        self.assertIsInstance(params[0], datetime.datetime)
+
+    def test_null_and_malformed_dates(self):
+        keys = [("pc.registered_date", "registered_date", True, True), ("pc.game_id", "game_id")]
+        self.assertEqual(Keyset(keys, 10, encode_cursor([None, 3]), PlayerGame).after, [None, 3])
+        with self.assertRaises(HTTPException) as raised:
+            Keyset(keys, 10, encode_cursor(["yesterday", 3]), PlayerGame)
+        self.assertEqual(raised.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
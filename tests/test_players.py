@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from controllers import players
+from models.players import Player
+from utils.cache import MISSING
+from tests.test_database import DatabaseTestCase
+
+
+def player_row( nickname: str ) -> tuple:
+    return (5, "Ana", "Díaz", nickname, "ana@example.com", None)
+
+PLAYER_COLUMNS = ["id", "firstname", "lastname", "nickname", "email", "birth_date"]
+
+
+class ReadAfterWriteTest(DatabaseTestCase):
+
+    pool_size = 3
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        players.players_cache.clear(broadcast=False)
+
+    async def asyncTearDown(self):
+        players.players_cache.clear(broadcast=False)
+        await super().asyncTearDown()
+
+    async def test_read_started_after_commit_does_not_join_older_read(self):
+        state = {"nickname": "old"}
+        first_read_started = threading.Event()
+        release_first_read = threading.Event()
+
+        def select_rows():
+            # La primera lectura toma la fila antes del UPDATE y se queda esperando
+            nickname = state["nickname"]
+            if not first_read_started.is_set():
+                first_read_started.set()
+                release_first_read.wait(2)
+            return [player_row(nickname)]
+
+        def update_rows():
+            state["nickname"] = "new"
+            return [player_row("new")]
+
+        self.results["WHERE [id] IN ( SELECT CAST"] = (PLAYER_COLUMNS, select_rows)
+        self.results["UPDATE [gamehub].[players]"] = (PLAYER_COLUMNS, update_rows)
+
+        first = asyncio.create_task(players.get_one(5))
+        self.assertTrue(await asyncio.to_thread(first_read_started.wait, 2))
+
+        await players.update_player(Player(id=5, nickname="new"))
+        second = asyncio.create_task(players.get_one(5))
+        await asyncio.sleep(0.05)
+        release_first_read.set()
+
+        first_row, second_row = await asyncio.gather(first, second)
+        self.assertEqual(first_row["nickname"], "old")
+        self.assertEqual(second_row["nickname"], "new")
+
+        # La lectura vieja no puede quedar en caché tras la invalidación
+        cached = players.players_cache.get(5)
+        self.assertTrue(cached is MISSING or cached["nickname"] == "new")
@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+from utils import profiling
+from utils.profiling import ProfilingMiddleware
+
+
+class ProfilingTriggerTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(profiling, "profile_token", "secret")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.middleware = ProfilingMiddleware(None)
+
+    def trigger( self, path, token=b"secret" ):
+        return self.middleware._trigger({"path": path, "headers": [(b"x-profile", token)]})
+
+    def test_header_triggers_a_capture(self):
+        self.assertEqual(self.trigger("/games/1"), "header")
+        self.assertIsNone(self.trigger("/games/1", b"other"))
+
+    def test_admin_routes_are_never_profiled(self):
+        for path in ("/logging", "/diagnostics", "/profiles", "/profiles/x.prof"):
+            with self.subTest(path=path):
+                self.assertIsNone(self.trigger(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from unittest import mock
+
+from utils import search
+from utils.search import SearchIndex
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = SearchIndex("test_games", "title", ["id", "title"], None)
+        titles = ["Pokémon Red", "Pokemon Blue", "Zelda", "Super Mario", "Mario Kart", "Poker Night"]
+        for id, title in enumerate(titles, 1):
+            self.index.add({"id": id, "title": title})
+
+    def tearDown(self):
+        search._indexes.pop("test_games", None)
+
+    def titles(self, query, limit=10):
+        return [ result["title"] for result in self.index.search(query, limit) ]
+
+    def test_ranking_and_limit(self):
+        self.assertEqual(self.titles("pokemon", 2), ["Pokémon Red", "Pokemon Blue"])
+        # Prefijo antes que prefijo de palabra
+        self.assertEqual(self.titles("mario"), ["Mario Kart", "Super Mario"])
+        # Con una errata sigue apareciendo por trigramas
+        self.assertEqual(self.titles("zeldda"), ["Zelda"])
+
+    def test_short_queries_and_candidate_cap(self):
+        self.assertEqual(self.titles("p"), [])
+        with mock.patch.object(search, "search_max_candidates", 1):
+            self.assertEqual(len(self.titles("po")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import hmac
+import os
+
+from fastapi import Header, HTTPException
+
+# Endpoints de operación (/logging, /diagnostics, /profiles): solo existen si se configura ADMIN_TOKEN
+admin_token: str = os.getenv("ADMIN_TOKEN", "")
+admin_header: str = os.getenv("ADMIN_HEADER", "X-Admin-Token").lower()
+
+# Rutas protegidas con require_admin_token; el perfilado no las captura nunca
+ADMIN_PATHS = ("/logging", "/diagnostics", "/profiles")
+
+
+async def require_admin_token( x_admin_token: str | None = Header(default=None, alias=admin_header) ):
+    # Falla cerrado: sin token configurado las rutas responden como si no existieran
+    if not admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not (x_admin_token and hmac.compare_digest(x_admin_token.encode(), admin_token.encode())):
+        raise HTTPException(status_code=403, detail="Token de administración inválido")
@@ -0,0 +1,59 @@
+import os
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+
+from utils.database import execute_bulk_insert
+
+# Tope de filas por petición en los endpoints /bulk
+max_bulk_rows: int = int(os.getenv("API_BULK_MAX_ROWS", "10000"))
+
+
+def check_bulk_size( items: list ):
+    if len(items) > max_bulk_rows:
+        raise HTTPException(status_code=413, detail=f"Bulk requests are limited to {max_bulk_rows} rows")
+
+_REJECTION_MESSAGES = {
+    "not_null": "Field required"
+    , "foreign_key": "Referenced row does not exist"
+    , "unique": "Value already exists"
+}
+
+def validate_rows( model: type[BaseModel], items: list[dict], columns: list[str], required: tuple = () ):
+    # Una sola pasada: las filas válidas pasan a tuplas y las inválidas se reportan por posición.
+    # Los modelos son todos Optional (sirven también para PUT): required= adelanta aquí las columnas NOT NULL
+    # conocidas; cualquier otro NULL en una columna NOT NULL lo aparta la base por fila.
+    rows = []
+    positions = []
+    errors = []
+    for index, item in enumerate(items):
+        try:
+            entity = model.model_validate(item)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.errors(include_url=False, include_context=False)})
+            continue
+        missing = [ column for column in required if getattr(entity, column) is None ]
+        if missing:
+            errors.append({"index": index, "errors": [ {"type": "missing", "loc": [column], "msg": "Field required"} for column in missing ]})
+            continue
+        rows.append(tuple(getattr(entity, column) for column in columns))
+        positions.append(index)
+    return rows, positions, errors
+
+async def bulk_create( model: type[BaseModel], table: str, columns: list[str], items: list[dict], chunk_size: int | None = None, required: tuple = (), references: dict | None = None, unique: list | None = None ) -> dict:
+    rows, positions, errors = validate_rows(model, items, columns, required)
+    generated, rejected = await execute_bulk_insert(table, columns, rows, chunk_size, references, unique)
+
+    # Las posiciones del lote enviado a la base se traducen a las de la petición
+    rejections = {}
+    for row_index, kind, key in rejected:
+        rejections.setdefault(positions[row_index], []).append(
+            {"type": kind, "loc": key.split(","), "msg": _REJECTION_MESSAGES.get(kind, kind)}
+        )
+    errors += [ {"index": index, "errors": found} for index, found in rejections.items() ]
+    errors.sort(key=lambda error: error["index"])
+
+    return {
+        "inserted": [ {"index": positions[row_index], "id": new_id} for row_index, new_id in sorted(generated.items()) ]
+        , "errors": errors
+    }
@@ -0,0 +1,249 @@
+import importlib
+import os
+import threading
+import time
+import uuid
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Valor centinela: distingue "no está en caché" de un valor cacheado como None
+MISSING = object()
+
+reference_cache_ttl: float = float(os.getenv("CACHE_REFERENCE_TTL", "300"))
+reference_cache_maxsize: int = int(os.getenv("CACHE_REFERENCE_MAXSIZE", "1024"))
+
+entity_cache_ttl: float = float(os.getenv("CACHE_ENTITY_TTL", "60"))
+entity_cache_maxsize: int = int(os.getenv("CACHE_ENTITY_MAXSIZE", "10000"))
+
+# Bus de invalidación entre workers: vacío = ninguno, "local" = en memoria (un solo proceso),
+# o "paquete.modulo:fabrica" para una implementación externa (Redis, Postgres NOTIFY, ...)
+invalidation_bus_setting: str = os.getenv("CACHE_INVALIDATION_BUS", "")
+
+
+class TTLCache:
+    # LRU acotado por tamaño con expiración por entrada
+
+    def __init__( self, name: str, maxsize: int = 1024, ttl: float = 300.0, node: "CacheNode | None" = None ):
+        self.name = name
+        self.node = node or default_node
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Cada invalidación avanza la generación; una lectura iniciada antes no puede guardar datos viejos
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.node.caches[name] = self
+
+    def get( self, key ):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set( self, key, value, generation: int | None = None ):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate( self, key, broadcast: bool = True ):
+        with self._lock:
+            self._data.pop(key, None)
+            self.generation += 1
+            self.invalidations += 1
+        if broadcast:
+            self.node.publish(self.name, key)
+
+    def clear( self, broadcast: bool = True ):
+        with self._lock:
+            self._data.clear()
+            self.generation += 1
+            self.invalidations += 1
+        if broadcast:
+            self.node.publish(self.name, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data)
+                , "maxsize": self.maxsize
+                , "ttl": self.ttl
+                , "hits": self.hits
+                , "misses": self.misses
+                , "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+                , "evictions": self.evictions
+                , "invalidations": self.invalidations
+            }
+
+
+async def cached_get_one( cache: TTLCache, key, load, id, fields: list[str] | None = None, load_projection=None ):
+    # Lectura por id: de la caché o de load(id) -> fila o None (normalmente un DataLoader).
+    # La caché y el loader guardan filas completas; una proyección va directa a load_projection(id, fields).
+    # key(id) da la clave de caché. Los errores de carga se propagan.
+    if fields is not None:
+        return await load_projection(id, fields)
+
+    cached = cache.get(key(id))
+    if cached is not MISSING:
+        return cached
+
+    generation = cache.generation
+    row = await load(id)
+    if row is not None:
+        cache.set(key(id), row, generation)
+    return row
+
+async def cached_multi_get( cache: TTLCache, key, load_many, ids: list ) -> dict:
+    # Lectura por lotes: los ids en caché se sirven de ahí y el resto sale de una sola llamada a
+    # load_many(ids) -> {id: fila}. key(id) da la clave de caché. Los errores de carga se propagan.
+    found = {}
+    pending = []
+    for id in dict.fromkeys(ids):
+        cached = cache.get(key(id))
+        if cached is not MISSING:
+            found[id] = cached
+        else:
+            pending.append(id)
+
+    if pending:
+        generation = cache.generation
+        rows = await load_many(pending)
+        for id, row in rows.items():
+            cache.set(key(id), row, generation)
+            found[id] = row
+
+    return {
+        "items": [ found.get(id) for id in ids ]
+        , "missing": [ id for id in dict.fromkeys(ids) if id not in found ]
+    }
+
+def cache_stats() -> dict:
+    return { name: cache.stats() for name, cache in default_node.caches.items() }
+
+
+# ============================================================
+#           CROSS-WORKER INVALIDATION (pub/sub hook)
+# ============================================================
+
+class InvalidationBus(ABC):
+    # Contrato para difundir invalidaciones entre workers (Redis, Postgres NOTIFY, ...).
+    # Mensaje: (origen, nombre de caché, clave); clave None significa vaciar la caché.
+    # Las claves son enteros o tuplas simples para poder serializarlas.
+
+    @abstractmethod
+    def publish( self, origin: str, cache_name: str, key ):
+        ...
+
+    @abstractmethod
+    def subscribe( self, callback ):
+        ...
+
+
+class LocalInvalidationBus(InvalidationBus):
+    # Sustituto en memoria: entrega los mensajes a todos los suscriptores del mismo proceso
+
+    def __init__(self):
+        self._subscribers = []
+        self.published = 0
+
+    def publish( self, origin: str, cache_name: str, key ):
+        self.published += 1
+        for callback in list(self._subscribers):
+            callback(origin, cache_name, key)
+
+    def subscribe( self, callback ):
+        self._subscribers.append(callback)
+
+
+class CacheNode:
+    # Las cachés de un worker y su conexión al bus; el id distingue los mensajes propios
+
+    def __init__( self, worker_id: str | None = None ):
+        self.worker_id = worker_id or uuid.uuid4().hex
+        self.caches: dict[str, TTLCache] = {}
+        # Otros consumidores del bus (p. ej. contadores de versión) registran aquí su manejador por nombre
+        self.listeners: dict = {}
+        self.bus: InvalidationBus | None = None
+
+    def attach( self, bus: InvalidationBus | None ):
+        self.bus = bus
+        if bus is not None:
+            bus.subscribe(self.receive)
+
+    def publish( self, cache_name: str, key ):
+        if self.bus is None:
+            return
+        try:
+            self.bus.publish(self.worker_id, cache_name, key)
+        except Exception as e:
+            # La caché local ya quedó invalidada; los demás workers expiran por TTL
+            logger.error("No se pudo publicar la invalidación de %s: %s", cache_name, e)
+
+    def receive( self, origin: str, cache_name: str, key ):
+        if origin == self.worker_id:
+            return
+        listener = self.listeners.get(cache_name)
+        if listener is not None:
+            listener(key)
+            return
+        cache = self.caches.get(cache_name)
+        if cache is None:
+            return
+        if key is None:
+            cache.clear(broadcast=False)
+        else:
+            cache.invalidate(tuple(key) if isinstance(key, list) else key, broadcast=False)
+
+
+default_node = CacheNode()
+worker_id: str = default_node.worker_id
+
+def set_invalidation_bus( bus: InvalidationBus | None ):
+    default_node.attach(bus)
+
+def invalidation_bus_configured() -> bool:
+    return default_node.bus is not None
+
+def on_remote_invalidation( name: str, callback ):
+    default_node.listeners[name] = callback
+
+def publish_invalidation( cache_name: str, key ):
+    default_node.publish(cache_name, key)
+
+def configure_invalidation_bus( setting: str | None = None ):
+    # Se llama al arrancar; la fábrica externa recibe la cadena completa por si necesita parámetros
+    setting = invalidation_bus_setting if setting is None else setting
+    if not setting or invalidation_bus_configured():
+        return
+    if setting == "local":
+        bus = LocalInvalidationBus()
+    else:
+        module_name, _, factory_name = setting.partition(":")
+        if not factory_name:
+            raise ValueError(f"CACHE_INVALIDATION_BUS inválido: {setting!r} (se espera 'local' o 'modulo:fabrica')")
+        bus = getattr(importlib.import_module(module_name), factory_name)()
+        if not isinstance(bus, InvalidationBus):
+            raise TypeError(f"{setting} no devolvió un InvalidationBus")
+    set_invalidation_bus(bus)
+    logger.info("Bus de invalidación de caché: %s", type(bus).__name__)
@@ -4,10 +4,25 @@ import pyodbc
 import logging
 import json
 import asyncio
+import threading
+import time
+import re
+import functools
+import contextvars
+import datetime
+from decimal import Decimal
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.singleflight import SingleFlight
+from utils.metrics import record_query, mark_query, register_gauge
+from utils.tracing import add_span, tracing_active
+from utils.log import log_query, setup_logging
 
 load_dotenv()
 
-logging.basicConfig( level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s' )
+setup_logging()
 logger = logging.getLogger(__name__)
 
 driver: str = os.getenv("SQL_DRIVER")
@@ -18,67 +33,830 @@ username: str = os.getenv("SQL_USERNAME")
 
 connection_string = f"DRIVER={driver};SERVER={server};DATABASE={database};UID={username};PWD={password}"
 
-async def get_db_connection():
+# ============================================================
+#                  CONNECTION POOL SETTINGS
+# ============================================================
+
+connect_timeout: int = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+pool_min_size: int = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+pool_max_size: int = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+pool_max_lifetime: float = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+pool_ping_interval: float = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))
+
+# Un hilo por conexión posible: ningún hilo queda esperando al pool
+executor_workers: int = int(os.getenv("DB_EXECUTOR_WORKERS", str(pool_max_size)))
+
+# Filas por fetchmany en las respuestas en streaming
+stream_batch_size: int = int(os.getenv("DB_STREAM_BATCH_SIZE", "500"))
+# Streams abiertos a la vez; cada uno retiene una conexión hasta terminar la descarga,
+# así las lecturas normales siempre conservan parte del pool
+stream_max_connections: int = int(os.getenv("DB_STREAM_MAX_CONNECTIONS", str(max(1, pool_max_size // 2))))
+
+# Filas por executemany en las altas masivas
+bulk_chunk_size: int = int(os.getenv("DB_BULK_CHUNK_SIZE", "1000"))
+
+single_flight_enabled: bool = os.getenv("DB_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__( self, connect, min_size=1, max_size=10, timeout=30.0, max_lifetime=1800.0, ping_interval=30.0 ):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Tamaño de pool inválido (min={min_size}, max={max_size})")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        # Conexiones libres como (conn, creada_en, ultimo_uso); se reutiliza la más reciente (LIFO)
+        self._idle = deque()
+        self._created_at = {}
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def open(self):
+        with self._cond:
+            self._closed = False
+
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._new_connection()
+            except Exception:
+                self._discard_slot()
+                raise
+            self._put_idle(conn)
+
+    def acquire( self, timeout=None ):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        entry = None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise Exception("El pool de conexiones está cerrado.")
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(
+                        f"Tiempo de espera agotado ({timeout}s) esperando una conexión libre del pool."
+                    )
+                self._cond.wait(remaining)
+
+        if entry is None:
+            try:
+                return self._new_connection()
+            except Exception:
+                self._discard_slot()
+                raise
+
+        conn, created_at, last_used = entry
+        now = time.monotonic()
+
+        if self.max_lifetime and now - created_at >= self.max_lifetime:
+            logger.info("Reciclando conexión que superó su tiempo de vida máximo.")
+            return self._replace(conn)
+
+        if now - last_used >= self.ping_interval and not self._is_alive(conn):
+            logger.warning("Conexión del pool no responde, se reemplaza.")
+            return self._replace(conn)
+
+        return conn
+
+    def release( self, conn, discard=False ):
+        if not discard:
+            try:
+                # Deja la conexión sin transacciones abiertas antes de devolverla
+                conn.rollback()
+            except pyodbc.Error as e:
+                logger.warning("No se pudo limpiar la conexión, se descarta: %s", e)
+                discard = True
+
+        created_at = self._created_at.get(id(conn), 0)
+        expired = self.max_lifetime and time.monotonic() - created_at >= self.max_lifetime
+
+        with self._cond:
+            keep = not discard and not expired and not self._closed
+            if keep:
+                self._idle.append((conn, created_at, time.monotonic()))
+                self._cond.notify()
+                return
+
+        self._close_connection(conn)
+        self._discard_slot()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+
+        for conn, _, _ in idle:
+            self._close_connection(conn)
+        logger.info("Pool de conexiones cerrado.")
+
+    def _new_connection(self):
+        conn = self._connect()
+        self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _put_idle( self, conn ):
+        with self._cond:
+            self._idle.append((conn, self._created_at.get(id(conn), time.monotonic()), time.monotonic()))
+            self._cond.notify()
+
+    def _replace( self, conn ):
+        self._close_connection(conn)
+        try:
+            return self._new_connection()
+        except Exception:
+            self._discard_slot()
+            raise
+
+    def _discard_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _close_connection( self, conn ):
+        self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except pyodbc.Error as e:
+            logger.warning("Error cerrando conexión: %s", e)
+
+    @staticmethod
+    def _is_alive( conn ) -> bool:
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except pyodbc.Error:
+            return False
+
+
+def _connect():
     try:
-        logger.info(f"Intentando conectar a la base de datos...")
-        conn = pyodbc.connect(connection_string, timeout=10)
+        logger.debug("Intentando conectar a la base de datos...")
+        conn = pyodbc.connect(connection_string, timeout=connect_timeout)
         logger.info("Conexión exitosa a la base de datos.")
         return conn
     except pyodbc.Error as e:
-        logger.error(f"Error de conexión a la base de datos: {str(e)}")
+        logger.error("Error de conexión a la base de datos: %s", e)
         raise Exception(f"Error de conexión a la base de datos: {str(e)}")
     except Exception as e:
-         logger.error(f"Error inesperado durante la conexión: {str(e)}")
+         logger.error("Error inesperado durante la conexión: %s", e)
          raise
 
-async def execute_query_json(sql_template, params=None, needs_commit=False):
+
+pool = ConnectionPool(
+    _connect
+    , min_size=pool_min_size
+    , max_size=pool_max_size
+    , timeout=pool_timeout
+    , max_lifetime=pool_max_lifetime
+    , ping_interval=pool_ping_interval
+)
+
+register_gauge("db_pool_connections", "Conexiones abiertas en el pool", lambda: pool.size)
+register_gauge("db_pool_idle_connections", "Conexiones libres en el pool", lambda: pool.idle)
+
+_executor: ThreadPoolExecutor | None = None
+_read_flights = SingleFlight("db_reads")
+
+# Contador de escrituras confirmadas por tabla. Entra en la clave de single-flight: una lectura que
+# empieza después de un commit no puede unirse a otra que empezó antes y quizá leyó la fila vieja.
+_write_counters: dict[str, int] = {}
+_write_lock = threading.Lock()
+_template_tables: dict[str, tuple] = {}
+_table_name = re.compile(r"gamehub\]?\s*\.\s*\[?(\w+)", re.IGNORECASE)
+
+def _tables_in( sql_template: str ) -> tuple:
+    # Memorizado por texto de plantilla; las tablas siempre van calificadas con el esquema gamehub
+    tables = _template_tables.get(sql_template)
+    if tables is None:
+        tables = tuple(sorted({ name.lower() for name in _table_name.findall(sql_template) }))
+        if len(_template_tables) < 10000:
+            _template_tables[sql_template] = tables
+    return tables
+
+def _record_write( tables ):
+    with _write_lock:
+        for table in tables:
+            _write_counters[table] = _write_counters.get(table, 0) + 1
+
+def _write_versions( tables ) -> tuple:
+    return tuple(_write_counters.get(table, 0) for table in tables)
+
+
+def _is_connection_error( e: pyodbc.Error ) -> bool:
+    # SQLSTATE 08xxx: la conexión se perdió o nunca se estableció
+    sqlstate = str(e.args[0]) if e.args else ""
+    return sqlstate.startswith("08") or isinstance(e, pyodbc.OperationalError)
+
+
+async def init_database():
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="db-worker")
+    _reset_slots()
+    try:
+        await run_in_db_executor(pool.open)
+        logger.info("Pool de conexiones listo (%d conexiones, máximo %d, %d hilos).", pool.size, pool.max_size, executor_workers)
+    except Exception as e:
+        # La API arranca igual; el pool abrirá conexiones bajo demanda
+        logger.error("No se pudo precargar el pool de conexiones: %s", e)
+
+async def close_database():
+    global _executor
+    pool.close()
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+    _reset_slots()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    # Fuera del lifespan (scripts, consola) se crea bajo demanda
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=executor_workers, thread_name_prefix="db-worker")
+    return _executor
+
+async def run_in_db_executor( func, *args, **kwargs ):
+    # Todas las llamadas bloqueantes a pyodbc pasan por aquí para no frenar el event loop
+    # run_in_executor no propaga contextvars: se copia el contexto para que las trazas lleguen al hilo
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(context.run, func, *args, **kwargs))
+
+
+# ============================================================
+#                  CONNECTION SLOTS (event loop side)
+# ============================================================
+
+# Un hilo del executor que espera en pool.acquire no puede atender los fetchmany de los streams
+# que liberarían esa conexión. Por eso la espera por una conexión libre ocurre aquí, en el loop:
+# un trabajo solo entra al executor cuando ya tiene una conexión reservada.
+_connection_slots: asyncio.Semaphore | None = None
+_stream_slots: asyncio.Semaphore | None = None
+
+def _reset_slots():
+    # Los semáforos quedan ligados al loop que los usa; se recrean en cada lifespan
+    global _connection_slots, _stream_slots
+    _connection_slots = None
+    _stream_slots = None
+
+def _get_slots() -> tuple[asyncio.Semaphore, asyncio.Semaphore]:
+    global _connection_slots, _stream_slots
+    if _connection_slots is None:
+        _connection_slots = asyncio.Semaphore(pool_max_size)
+        _stream_slots = asyncio.Semaphore(min(stream_max_connections, pool_max_size))
+    return _connection_slots, _stream_slots
+
+async def _acquire_slot( semaphore: asyncio.Semaphore ):
+    try:
+        await asyncio.wait_for(semaphore.acquire(), pool_timeout)
+    except TimeoutError:
+        raise PoolTimeoutError(
+            f"Tiempo de espera agotado ({pool_timeout}s) esperando una conexión libre del pool."
+        ) from None
+
+async def run_with_connection( func, *args, **kwargs ):
+    # Para trabajos que toman y devuelven su propia conexión dentro del executor
+    connection_slots, _ = _get_slots()
+    await _acquire_slot(connection_slots)
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    try:
+        future = loop.run_in_executor(_get_executor(), functools.partial(context.run, func, *args, **kwargs))
+    except BaseException:
+        connection_slots.release()
+        raise
+    # El permiso se devuelve cuando el hilo termina, aunque quien esperaba se haya cancelado
+    future.add_done_callback(lambda _: connection_slots.release())
+    return await asyncio.shield(future)
+
+# ============================================================
+#                    ROW REPRESENTATION
+# ============================================================
+
+class Columns:
+    __slots__ = ("names", "index")
+
+    def __init__( self, names ):
+        self.names = tuple(names)
+        self.index = { name: position for position, name in enumerate(self.names) }
+
+
+class Row(Mapping):
+    # Fila compacta: comparte los nombres de columna del cursor y guarda los valores en una tupla
+    __slots__ = ("_columns", "_values")
+
+    def __init__( self, columns: Columns, values ):
+        self._columns = columns
+        self._values = tuple(values)
+
+    def __getitem__( self, key ):
+        return self._values[self._columns.index[key]]
+
+    def __iter__(self):
+        return iter(self._columns.names)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__( self, key ):
+        return key in self._columns.index
+
+    def __repr__(self):
+        return f"Row({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return dict(zip(self._columns.names, self._values))
+
+
+# Los nombres de columna se resuelven una sola vez por forma de resultado
+_columns_cache: dict[tuple, Columns] = {}
+
+def _columns_for( description ) -> Columns:
+    names = tuple(column[0] for column in description)
+    columns = _columns_cache.get(names)
+    if columns is None:
+        columns = _columns_cache.setdefault(names, Columns(names))
+    return columns
+
+def _build_rows( columns: Columns, raw_rows ) -> list[Row]:
+    return [
+        Row(columns, [str(item) if isinstance(item, (bytes, bytearray)) else item for item in row])
+        for row in raw_rows
+    ]
+
+def _json_default( value ):
+    # Mismo formato que usa FastAPI al codificar, para que ambas rutas den el mismo JSON
+    if isinstance(value, Row):
+        return value.to_dict()
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    return str(value)
+
+def dumps_rows( rows ) -> str:
+    return json.dumps(rows, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+def _execute_query_sync(sql_template, params=None, needs_commit=False) -> list[Row]:
 
     conn = None
     cursor = None
+    discard = False
     try:
-        conn = await get_db_connection()
+        started = time.perf_counter()
+        conn = pool.acquire()
+        connected = time.perf_counter()
         cursor = conn.cursor()
-        param_info = "(sin parámetros)" if not params else f"(con {len(params)} parámetros)"
-        logger.info(f"Ejecutando consulta {param_info}: {sql_template}")
 
         if params:
             cursor.execute(sql_template, params)
         else:
             cursor.execute(sql_template)
 
+        # En lotes con varias sentencias (INSERT + SELECT) se salta al primer resultado con columnas
+        while cursor.description is None and cursor.nextset():
+            pass
+        executed = time.perf_counter()
+
         results = []
         if cursor.description:
-            columns = [column[0] for column in cursor.description]
-            logger.info(f"Columnas obtenidas: {columns}")
-            for row in cursor.fetchall():
-                processed_row = [str(item) if isinstance(item, (bytes, bytearray)) else item for item in row]
-                results.append(dict(zip(columns, processed_row)))
-        else:
-             logger.info("La consulta no devolvió columnas (posiblemente INSERT/UPDATE/DELETE).")
+            columns = _columns_for(cursor.description)
+            results = _build_rows(columns, cursor.fetchall())
+        fetched = time.perf_counter()
 
         if needs_commit:
-            logger.info("Realizando commit de la transacción.")
             conn.commit()
+            # Antes de devolver el control: quien lea después ya no comparte una lectura anterior
+            _record_write(_tables_in(sql_template))
+        committed = time.perf_counter()
 
-        return json.dumps(results, default=str)
-
+        # El commit cuenta como parte de la ejecución
+        record_query(sql_template, connected - started, executed - connected + committed - fetched, fetched - executed, len(results))
+        if tracing_active():
+            add_span("db_connect", started, connected)
+            add_span("db_execute", connected, executed, rows=len(results))
+            add_span("db_fetch", executed, fetched)
+            if needs_commit:
+                add_span("db_commit", fetched, committed)
+        # Un solo registro por consulta, muestreado por plantilla (SQL_LOG)
+        log_query(
+            logger, sql_template, "Consulta (%d parámetros, commit=%s): %d filas en %.1f ms: %s"
+            , len(params) if params else 0, needs_commit, len(results), (committed - started) * 1000
+            , rows=len(results), duration_ms=round((committed - started) * 1000, 3)
+        )
+        return results
     except pyodbc.Error as e:
-        logger.error(f"Error ejecutando la consulta (SQLSTATE: {e.args[0]}): {str(e)}")
-        if conn and needs_commit:
+        logger.error("Error ejecutando la consulta (SQLSTATE: %s): %s", e.args[0], e, extra={"sql": sql_template})
+        discard = _is_connection_error(e)
+        if conn and needs_commit and not discard:
             try:
                 logger.warning("Realizando rollback debido a error.")
                 conn.rollback()
             except pyodbc.Error as rb_e:
-                 logger.error(f"Error durante el rollback: {rb_e}")
+                 logger.error("Error durante el rollback: %s", rb_e)
+                 discard = True
 
         raise Exception(f"Error ejecutando consulta: {str(e)}") from e
     except Exception as e:
-        logger.error(f"Error inesperado durante la ejecución de la consulta: {str(e)}")
+        logger.error("Error inesperado durante la ejecución de la consulta: %s", e, extra={"sql": sql_template})
         raise # Relanza el error inesperado
     finally:
+        if cursor:
+            try:
+                cursor.close()
+            except pyodbc.Error:
+                discard = True
+        if conn:
+            pool.release(conn, discard=discard)
+
+async def execute_query(sql_template, params=None, needs_commit=False) -> list[Row]:
+    mark_query(sql_template)
+    if needs_commit or not single_flight_enabled:
+        return await run_with_connection(_execute_query_sync, sql_template, params, needs_commit)
+
+    try:
+        key = (sql_template, tuple(params) if params else (), _write_versions(_tables_in(sql_template)))
+        hash(key)
+    except TypeError:
+        return await run_with_connection(_execute_query_sync, sql_template, params, needs_commit)
+
+    # Lecturas idénticas en curso (misma plantilla y parámetros) comparten una ejecución
+    return await _read_flights.do(key, lambda: run_with_connection(_execute_query_sync, sql_template, params, False))
+
+
+# ============================================================
+#                   STREAMING (fetchmany)
+# ============================================================
+
+class RowStream:
+    # Mantiene la conexión del pool mientras el cliente consume los lotes;
+    # el lock evita cerrar el cursor mientras otro hilo sigue leyendo de él
+    def __init__( self, conn, cursor, columns: Columns, batch_size: int, sql_template: str = "", connect_time: float = 0.0, execute_time: float = 0.0 ):
+        self._conn = conn
+        self._cursor = cursor
+        self._columns = columns
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        # Métricas acumuladas; se registran al devolver la conexión
+        self._sql_template = sql_template
+        self._connect_time = connect_time
+        self._execute_time = execute_time
+        self._fetch_time = 0.0
+        self._rows = 0
+        # Devuelve en el loop los permisos de conexión y de stream (lo asigna stream_query)
+        self.on_release = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> list[Row]:
+        rows = await run_in_db_executor(self._fetch)
+        if not rows:
+            raise StopAsyncIteration
+        return rows
+
+    def close(self):
+        if self._conn is not None:
+            _get_executor().submit(self._close)
+
+    def __del__(self):
+        # Red de seguridad si la respuesta nunca llegó a recorrer el stream
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _fetch(self) -> list[Row]:
+        with self._lock:
+            if self._conn is None:
+                return []
+            started = time.perf_counter()
+            try:
+                raw_rows = self._cursor.fetchmany(self.batch_size)
+            except pyodbc.Error as e:
+                logger.error("Error leyendo lote (SQLSTATE: %s): %s", e.args[0], e)
+                self._release(discard=_is_connection_error(e))
+                raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+            rows = _build_rows(self._columns, raw_rows)
+            self._fetch_time += time.perf_counter() - started
+            self._rows += len(rows)
+            if not raw_rows:
+                self._release()
+            return rows
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._release()
+
+    def _release( self, discard=False ):
+        try:
+            self._cursor.close()
+        except pyodbc.Error:
+            discard = True
+        pool.release(self._conn, discard=discard)
+        self._conn = None
+        if self.on_release is not None:
+            self.on_release()
+        record_query(self._sql_template, self._connect_time, self._execute_time, self._fetch_time, self._rows)
+        log_query(
+            logger, self._sql_template, "Consulta en streaming: %d filas, %.1f ms de lectura: %s"
+            , self._rows, self._fetch_time * 1000
+            , rows=self._rows, streaming=True
+        )
+
+
+def _open_stream_sync(sql_template, params=None, batch_size=None) -> RowStream:
+    started = time.perf_counter()
+    conn = pool.acquire()
+    connected = time.perf_counter()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+
+        if params:
+            cursor.execute(sql_template, params)
+        else:
+            cursor.execute(sql_template)
+
+        if not cursor.description:
+            raise Exception("La consulta en streaming no devolvió columnas.")
+
+        executed = time.perf_counter()
+        if tracing_active():
+            add_span("db_connect", started, connected)
+            add_span("db_execute", connected, executed)
+        return RowStream(conn, cursor, _columns_for(cursor.description), batch_size or stream_batch_size, sql_template, connected - started, executed - connected)
+
+    except pyodbc.Error as e:
+        logger.error("Error ejecutando la consulta (SQLSTATE: %s): %s", e.args[0], e, extra={"sql": sql_template})
+        if cursor:
+            cursor.close()
+        pool.release(conn, discard=_is_connection_error(e))
+        raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+    except Exception:
         if cursor:
             cursor.close()
+        pool.release(conn)
+        raise
+
+async def stream_query(sql_template, params=None, batch_size=None) -> RowStream:
+    # La consulta se ejecuta aquí, así los errores llegan antes de enviar cabeceras.
+    # El stream retiene un permiso de stream y uno de conexión hasta devolver su conexión;
+    # sus fetchmany no piden permiso porque ya tienen la conexión.
+    connection_slots, stream_slots = _get_slots()
+    await _acquire_slot(stream_slots)
+    try:
+        await _acquire_slot(connection_slots)
+    except BaseException:
+        stream_slots.release()
+        raise
+
+    loop = asyncio.get_running_loop()
+
+    def release_slots():
+        connection_slots.release()
+        stream_slots.release()
+
+    def release_from_thread():
+        try:
+            loop.call_soon_threadsafe(release_slots)
+        except RuntimeError:
+            # El loop ya se cerró (apagado); no queda nadie esperando los permisos
+            pass
+
+    try:
+        stream = await run_in_db_executor(_open_stream_sync, sql_template, params, batch_size)
+    except BaseException:
+        release_slots()
+        raise
+    stream.on_release = release_from_thread
+    return stream
+
+
+# ============================================================
+#              BULK INSERT (fast_executemany)
+# ============================================================
+
+# Tipo ODBC de cada tipo de SQL Server para setinputsizes
+_PARAMETER_TYPES = {
+    "int": pyodbc.SQL_INTEGER
+    , "bigint": pyodbc.SQL_BIGINT
+    , "smallint": pyodbc.SQL_SMALLINT
+    , "tinyint": pyodbc.SQL_TINYINT
+    , "bit": pyodbc.SQL_BIT
+    , "decimal": pyodbc.SQL_DECIMAL
+    , "numeric": pyodbc.SQL_NUMERIC
+    , "float": pyodbc.SQL_FLOAT
+    , "real": pyodbc.SQL_REAL
+    , "date": pyodbc.SQL_TYPE_DATE
+    , "datetime": pyodbc.SQL_TYPE_TIMESTAMP
+    , "datetime2": pyodbc.SQL_TYPE_TIMESTAMP
+    , "smalldatetime": pyodbc.SQL_TYPE_TIMESTAMP
+    , "time": pyodbc.SQL_SS_TIME2
+    , "uniqueidentifier": pyodbc.SQL_GUID
+    , "nvarchar": pyodbc.SQL_WVARCHAR
+    , "nchar": pyodbc.SQL_WCHAR
+    , "varchar": pyodbc.SQL_VARCHAR
+    , "char": pyodbc.SQL_CHAR
+    , "varbinary": pyodbc.SQL_VARBINARY
+    , "binary": pyodbc.SQL_BINARY
+}
+
+# Columnas de cada tabla destino: { nombre: (tipo, max_length, precision, scale, admite NULL) }.
+# Se leen una vez por proceso; un cambio de esquema requiere reiniciar.
+_table_columns: dict[str, dict] = {}
+
+def _columns_of( cursor, table: str ) -> dict:
+    columns = _table_columns.get(table)
+    if columns is None:
+        cursor.execute("""
+            SELECT c.[name], TYPE_NAME(c.[system_type_id]), c.[max_length], c.[precision], c.[scale], c.[is_nullable]
+            FROM sys.columns c
+            WHERE c.[object_id] = OBJECT_ID(?);
+        """, table)
+        columns = { row[0]: tuple(row[1:]) for row in cursor.fetchall() }
+        if columns:
+            _table_columns[table] = columns
+    return columns
+
+def _input_size( column ) -> tuple:
+    # (tipo ODBC, tamaño, decimales) como los espera setinputsizes; tamaño 0 = (max)
+    if column is None:
+        return (pyodbc.SQL_WVARCHAR, 0, 0)
+    type_name, max_length, precision, scale, _ = column
+    if type_name in ("nvarchar", "nchar"):
+        return (_PARAMETER_TYPES[type_name], max(max_length, 0) // 2, 0)
+    if type_name in ("varchar", "char", "varbinary", "binary"):
+        return (_PARAMETER_TYPES[type_name], max(max_length, 0), 0)
+    if type_name in _PARAMETER_TYPES:
+        return (_PARAMETER_TYPES[type_name], precision, scale)
+    # Cualquier otro tipo viaja como texto y lo convierte el servidor
+    return (pyodbc.SQL_WVARCHAR, 0, 0)
+
+def _rejection_checks( table: str, staging: str, not_null: list, references: dict, unique: list ) -> list[tuple[str, str, str]]:
+    # (tipo, columnas, SELECT de row_index) por cada restricción; los bloqueos sobre la
+    # tabla destino evitan que otra transacción cree el duplicado entre la comprobación y el MERGE
+    checks = []
+    for column in not_null:
+        checks.append(("not_null", column, f"""
+            SELECT s.[row_index] FROM {staging} s WHERE s.[{column}] IS NULL
+        """))
+    for column, referenced in references.items():
+        checks.append(("foreign_key", column, f"""
+            SELECT s.[row_index] FROM {staging} s
+            WHERE s.[{column}] IS NOT NULL
+            AND NOT EXISTS ( SELECT 1 FROM {referenced} r WITH (HOLDLOCK) WHERE r.[id] = s.[{column}] )
+        """))
+    for key in unique:
+        matches = " AND ".join(f"t.[{column}] = s.[{column}]" for column in key)
+        present = " AND ".join(f"[{column}] IS NOT NULL" for column in key)
+        partition = " ,".join(f"[{column}]" for column in key)
+        checks.append(("unique", ",".join(key), f"""
+            SELECT s.[row_index] FROM {staging} s
+            WHERE EXISTS ( SELECT 1 FROM {table} t WITH (UPDLOCK, HOLDLOCK) WHERE {matches} )
+        """))
+        # Dentro del propio lote gana la primera aparición
+        checks.append(("unique", ",".join(key), f"""
+            SELECT x.[row_index] FROM (
+                SELECT [row_index], ROW_NUMBER() OVER ( PARTITION BY {partition} ORDER BY [row_index] ) AS [n]
+                FROM {staging} WHERE {present}
+            ) x
+            WHERE x.[n] > 1
+        """))
+    return checks
+
+def _bulk_insert_sync( table: str, columns: list[str], rows: list[tuple], chunk_size: int, references: dict | None = None, unique: list | None = None ) -> tuple[dict, list]:
+    # Las filas se cargan por lotes en una tabla temporal y un MERGE las inserta devolviendo
+    # (posición, id); MERGE permite usar columnas del origen en OUTPUT, INSERT ... SELECT no.
+    # Antes del MERGE se apartan las filas que violarían un NOT NULL, una FK o una clave única declarada,
+    # para reportarlas por posición en vez de abortar todo el lote.
+    staging = "#bulk_staging"
+    rejected_table = "#bulk_rejected"
+    column_list = " ,".join(f"[{column}]" for column in columns)
+    nullable_list = " ,".join(f"t.[{column}]" for column in columns)
+    source_list = " ,".join(f"source.[{column}]" for column in columns)
+    placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+
+    conn = None
+    cursor = None
+    discard = False
+    try:
+        started = time.perf_counter()
+        conn = pool.acquire()
+        connected = time.perf_counter()
+        cursor = conn.cursor()
+        logger.info("Alta masiva en %s: %d filas en lotes de %d.", table, len(rows), chunk_size)
+
+        target_columns = _columns_of(cursor, table)
+
+        cursor.execute(f"DROP TABLE IF EXISTS {staging};")
+        # Mismos tipos que el destino, pero todas las columnas admiten NULL (vienen del lado externo del
+        # LEFT JOIN): un NULL en una columna NOT NULL se aparta como rechazo en vez de abortar la carga
+        cursor.execute(f"SELECT TOP 0 CAST(0 AS INT) AS [row_index], {nullable_list} INTO {staging} FROM ( SELECT 1 AS [x] ) d LEFT JOIN {table} t ON 1 = 0;")
+
+        cursor.fast_executemany = True
+        # Con fast_executemany, msodbcsql no puede describir los parámetros de una tabla #temporal
+        # ("Invalid object name"); los tipos se declaran a partir de las columnas del destino
+        cursor.setinputsizes([ (pyodbc.SQL_INTEGER, 0, 0), *[ _input_size(target_columns.get(column)) for column in columns ] ])
+        insertscript = f"INSERT INTO {staging} ( [row_index], {column_list} ) VALUES ( {placeholders} );"
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cursor.executemany(insertscript, [ (start + offset, *row) for offset, row in enumerate(chunk) ])
+
+        not_null = [ column for column in columns if column in target_columns and not target_columns[column][4] ]
+        checks = _rejection_checks(table, staging, not_null, references or {}, unique or [])
+        rejected = []
+        if checks:
+            cursor.execute(f"DROP TABLE IF EXISTS {rejected_table};")
+            cursor.execute(f"CREATE TABLE {rejected_table} ( [row_index] INT, [kind] NVARCHAR(20), [columns] NVARCHAR(400) );")
+            for kind, key, selectscript in checks:
+                cursor.execute(f"INSERT INTO {rejected_table} ( [row_index], [kind], [columns] ) SELECT [row_index], ?, ? FROM ( {selectscript} ) c;", (kind, key))
+            cursor.execute(f"DELETE s FROM {staging} s WHERE EXISTS ( SELECT 1 FROM {rejected_table} r WHERE r.[row_index] = s.[row_index] );")
+            cursor.execute(f"SELECT [row_index], [kind], [columns] FROM {rejected_table} ORDER BY [row_index];")
+            rejected = [ tuple(row) for row in cursor.fetchall() ]
+            cursor.execute(f"DROP TABLE {rejected_table};")
+
+        cursor.execute(f"""
+            MERGE INTO {table} AS target
+            USING {staging} AS source ON 1 = 0
+            WHEN NOT MATCHED THEN
+                INSERT ( {column_list} ) VALUES ( {source_list} )
+            OUTPUT source.[row_index], INSERTED.[id];
+        """)
+        generated = dict(cursor.fetchall())
+
+        cursor.execute(f"DROP TABLE {staging};")
+        conn.commit()
+        _record_write(_tables_in(table))
+        finished = time.perf_counter()
+        record_query(f"BULK INSERT {table}", connected - started, finished - connected, 0.0, len(generated))
+        if tracing_active():
+            add_span("db_connect", started, connected)
+            add_span("db_execute", connected, finished, rows=len(generated))
+
+        return generated, rejected
+
+    except pyodbc.Error as e:
+        logger.error("Error en alta masiva (SQLSTATE: %s): %s", e.args[0], e)
+        discard = _is_connection_error(e)
+        if conn and not discard:
+            try:
+                # El rollback también elimina la tabla temporal creada en la transacción
+                conn.rollback()
+            except pyodbc.Error as rb_e:
+                logger.error("Error durante el rollback: %s", rb_e)
+                discard = True
+        raise Exception(f"Error ejecutando consulta: {str(e)}") from e
+    finally:
+        if cursor:
+            try:
+                cursor.close()
+            except pyodbc.Error:
+                discard = True
         if conn:
-            conn.close()
-            logger.info("Conexión cerrada.")
+            pool.release(conn, discard=discard)
 
+async def execute_bulk_insert( table: str, columns: list[str], rows: list[tuple], chunk_size: int | None = None, references: dict | None = None, unique: list | None = None ) -> tuple[dict, list]:
+    # Todo en una sola transacción. Devuelve ({posición: id} de las filas insertadas,
+    # [(posición, tipo, columnas)] de las apartadas por references/unique).
+    # references: {columna: tabla referenciada por [id]}; unique: [(columna, ...), ...]
+    if not rows:
+        return {}, []
+    return await run_with_connection(_bulk_insert_sync, table, columns, rows, chunk_size or bulk_chunk_size, references, unique)
@@ -0,0 +1,78 @@
+import asyncio
+import os
+
+# Ventana para juntar ids pedidos por distintas peticiones antes de consultar
+batch_tick: float = float(os.getenv("DB_BATCH_TICK_MS", "1")) / 1000
+batch_max_size: int = int(os.getenv("DB_BATCH_MAX_SIZE", "500"))
+
+
+class DataLoader:
+    # Agrupa las cargas por clave hechas dentro de un mismo tick en una sola llamada a batch_fn,
+    # que recibe la lista de claves y devuelve {clave: valor}; las claves ausentes resuelven a None
+
+    def __init__( self, name: str, batch_fn, tick: float = batch_tick, max_batch_size: int = batch_max_size ):
+        self.name = name
+        self._batch_fn = batch_fn
+        self.tick = tick
+        self.max_batch_size = max_batch_size
+        self._pending: dict = {}
+        self._handle = None
+        self.loads = 0
+        self.batches = 0
+        self.keys = 0
+        _loaders[name] = self
+
+    async def load( self, key ):
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch()
+            elif self._handle is None:
+                self._handle = loop.call_later(self.tick, self._dispatch)
+        return await asyncio.shield(future)
+
+    async def load_many( self, keys ) -> list:
+        return await asyncio.gather(*[ self.load(key) for key in keys ])
+
+    def _dispatch(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run( self, batch: dict ):
+        self.batches += 1
+        self.keys += len(batch)
+        try:
+            results = await self._batch_fn(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Evita el aviso de excepción no leída si todos los que esperaban se cancelaron
+                    future.add_done_callback(lambda done: done.exception())
+            return
+
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads
+            , "batches": self.batches
+            , "keys": self.keys
+            , "avg_batch_size": round(self.keys / self.batches, 2) if self.batches else 0.0
+        }
+
+
+_loaders: dict[str, DataLoader] = {}
+
+def dataloader_stats() -> dict:
+    return { name: loader.stats() for name, loader in _loaders.items() }
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from utils.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+diagnostics_enabled: bool = os.getenv("DIAGNOSTICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Cada cuánto se mide el retraso del event loop
+loop_lag_interval: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+# Un paso de corrutina que retiene el loop más que esto se reporta con su pila
+blocking_threshold: float = float(os.getenv("BLOCKING_THRESHOLD", "0.1"))
+# Bloqueos recientes que se conservan con su pila para /diagnostics
+diagnostics_max_reports: int = int(os.getenv("DIAGNOSTICS_MAX_REPORTS", "50"))
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_ROUTES_DIR = os.path.join(_BASE_DIR, "routes") + os.sep
+_CONTROLLERS_DIR = os.path.join(_BASE_DIR, "controllers") + os.sep
+
+loop_lag = Histogram("event_loop_lag_seconds", "Retraso del event loop respecto al tick programado", ())
+loop_blocking = Histogram("event_loop_blocking_seconds", "Bloqueos del event loop por ruta y controlador", ("route", "controller"))
+
+
+# ============================================================
+#                  STACK ATTRIBUTION
+# ============================================================
+
+def _frame_name( frame, directory: str ) -> str:
+    module = os.path.splitext(frame.f_code.co_filename[len(directory):])[0].replace(os.sep, ".")
+    return f"{module}.{frame.f_code.co_name}"
+
+def _attribute( frame ) -> tuple[str | None, str | None, list[str]]:
+    # Ruta = marco más externo de routes/, controlador = marco más interno de controllers/
+    stack = traceback.extract_stack(frame)
+    route = None
+    controller = None
+    current = frame
+    while current is not None:
+        filename = current.f_code.co_filename
+        if filename.startswith(_ROUTES_DIR):
+            route = _frame_name(current, _ROUTES_DIR)
+        elif controller is None and filename.startswith(_CONTROLLERS_DIR):
+            controller = _frame_name(current, _CONTROLLERS_DIR)
+        current = current.f_back
+    return route, controller, traceback.format_list(stack[-30:])
+
+
+# ============================================================
+#                  LAG MONITOR AND WATCHDOG
+# ============================================================
+
+class LoopMonitor:
+    # Una tarea en el loop programa ticks; un hilo aparte vigila que lleguen a tiempo.
+    # Si un tick se retrasa más del umbral, el hilo toma la pila del hilo del loop en ese momento.
+
+    def __init__(self):
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._loop_thread_id = None
+        # Momento en que debería despertar el próximo tick (monotonic)
+        self._expected = 0.0
+        self._capture = None
+        self._lags = deque(maxlen=600)
+        self.max_lag = 0.0
+        self.ticks = 0
+        self.reports = deque(maxlen=diagnostics_max_reports)
+        self.totals = {}
+
+    def start( self ):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._expected = time.monotonic() + loop_lag_interval
+        self._stop.clear()
+        self._task = asyncio.create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Monitor del event loop activo (tick %.0f ms, umbral %.0f ms)", loop_lag_interval * 1000, blocking_threshold * 1000)
+
+    async def stop( self ):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._thread.join(timeout=1)
+        self._task = None
+        self._thread = None
+
+    async def _tick( self ):
+        while True:
+            with self._lock:
+                self._expected = time.monotonic() + loop_lag_interval
+            await asyncio.sleep(loop_lag_interval)
+            now = time.monotonic()
+            with self._lock:
+                lag = max(0.0, now - self._expected)
+                capture = self._capture
+                self._capture = None
+            self.ticks += 1
+            self._lags.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            loop_lag.observe((), lag)
+            # El retraso del tick es una cota inferior del bloqueo: pudo empezar antes del tick programado
+            if lag >= blocking_threshold:
+                self._report(lag, capture)
+
+    def _watch( self ):
+        # Revisa varias veces por umbral; una sola captura por bloqueo
+        while not self._stop.wait(blocking_threshold / 4):
+            now = time.monotonic()
+            with self._lock:
+                if self._capture is not None or now - self._expected < blocking_threshold:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            route, controller, stack = _attribute(frame)
+            del frame
+            with self._lock:
+                # El tick pudo llegar mientras se tomaba la pila
+                if time.monotonic() - self._expected >= blocking_threshold:
+                    self._capture = (route, controller, stack)
+
+    def _report( self, lag: float, capture ):
+        route, controller, stack = capture if capture else (None, None, [])
+        labels = (route or "unknown", controller or "unknown")
+        loop_blocking.observe(labels, lag)
+        with self._lock:
+            total = self.totals.setdefault(labels, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += lag
+            total[2] = max(total[2], lag)
+            self.reports.append({
+                "at": time.time()
+                , "duration_ms": round(lag * 1000, 1)
+                , "route": route
+                , "controller": controller
+                , "stack": stack
+            })
+        logger.warning(
+            "Event loop bloqueado %.0f ms (ruta %s, controlador %s)%s"
+            , lag * 1000, route, controller, ("\n" + "".join(stack)) if stack else ""
+        )
+
+    def stats( self ) -> dict:
+        lags = sorted(self._lags)
+        with self._lock:
+            by_location = [
+                {"route": route, "controller": controller, "count": count, "total_ms": round(total * 1000, 1), "max_ms": round(worst * 1000, 1)}
+                for (route, controller), (count, total, worst) in self.totals.items()
+            ]
+            reports = list(self.reports)
+        by_location.sort(key=lambda entry: -entry["total_ms"])
+        return {
+            "running": self._task is not None
+            , "interval_ms": loop_lag_interval * 1000
+            , "threshold_ms": blocking_threshold * 1000
+            , "ticks": self.ticks
+            , "lag_ms": {
+                "last": round(self._lags[-1] * 1000, 2) if lags else 0.0
+                , "p50": round(lags[len(lags) // 2] * 1000, 2) if lags else 0.0
+                , "p99": round(lags[int(len(lags) * 0.99)] * 1000, 2) if lags else 0.0
+                , "max": round(self.max_lag * 1000, 2)
+            }
+            , "blocking": by_location
+            , "recent": reports[::-1]
+        }
+
+
+monitor = LoopMonitor()
+
+def start_diagnostics():
+    # Se llama desde el lifespan, ya dentro del loop
+    if diagnostics_enabled:
+        monitor.start()
+
+async def stop_diagnostics():
+    await monitor.stop()
+
+def diagnostics_stats() -> dict:
+    return monitor.stats()
@@ -0,0 +1,79 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import defaultdict
+
+from fastapi import HTTPException, Request
+
+from utils.cache import invalidation_bus_configured, on_remote_invalidation, publish_invalidation
+
+# Con ETAG_ENABLED=false las rutas no emiten ETag ni responden 304.
+# Aun activado, hace falta CACHE_INVALIDATION_BUS: sin bus cada worker cuenta solo sus escrituras
+# y validaría con 304 datos que otro worker ya cambió (con un único proceso basta "local").
+etag_enabled: bool = os.getenv("ETAG_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Los contadores viven en memoria: el prefijo evita que un reinicio repita ETags de datos distintos
+_epoch: str = uuid.uuid4().hex[:8]
+_versions = defaultdict(int)
+_lock = threading.Lock()
+
+
+# ============================================================
+#                  TABLE VERSION COUNTERS
+# ============================================================
+
+def bump_version( table: str, broadcast: bool = True ):
+    # Las funciones de escritura lo llaman tras confirmar e invalidar sus cachés: una lectura que ya vea
+    # la versión nueva no puede tomar la fila vieja de la caché. Los demás workers avanzan su contador por el bus.
+    # Los cambios hechos fuera de la API no pasan por aquí y no cambian el ETag.
+    with _lock:
+        _versions[table] += 1
+    if broadcast:
+        publish_invalidation("versions", table)
+
+def table_version( table: str ) -> int:
+    return _versions[table]
+
+def version_stats() -> dict:
+    with _lock:
+        return dict(_versions)
+
+on_remote_invalidation("versions", lambda table: bump_version(table, broadcast=False))
+
+
+# ============================================================
+#                  CONDITIONAL GET (If-None-Match)
+# ============================================================
+
+def etags_active() -> bool:
+    return etag_enabled and invalidation_bus_configured()
+
+def make_etag( request: Request, tables ) -> str:
+    # Mismas versiones + misma URL => mismo cuerpo; no hace falta leer ni codificar la respuesta
+    versions = ".".join(str(table_version(table)) for table in tables)
+    target = request.url.path + "?" + "&".join(sorted(request.url.query.split("&")))
+    digest = hashlib.blake2b(target.encode("utf-8"), digest_size=8).hexdigest()
+    return f'"{_epoch}-{versions}-{digest}"'
+
+def _matches( header: str, etag: str ) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match usa comparación débil: W/"x" equivale a "x"
+    candidates = [ tag.strip().removeprefix("W/") for tag in header.split(",") ]
+    return etag in candidates
+
+def etag_for( *tables ):
+    # Dependencia de ruta: responde 304 antes de ejecutar la consulta si el cliente ya tiene esta versión
+    async def dependency( request: Request ) -> str | None:
+        if not etags_active():
+            return None
+        etag = make_etag(request, tables)
+        header = request.headers.get("if-none-match")
+        if header and _matches(header, etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        return etag
+    return dependency
+
+def etag_headers( etag: str | None ) -> dict | None:
+    return {"ETag": etag} if etag else None
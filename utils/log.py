@@ -0,0 +1,234 @@
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Literal
+
+from utils.cache import on_remote_invalidation, publish_invalidation
+from utils.metrics import query_label
+from utils.tracing import current_trace_id
+
+# Nivel raíz y formato de salida: "text" (el de siempre) o "json" (un objeto por línea)
+log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
+log_format: str = os.getenv("LOG_FORMAT", "text").lower()
+# Registros pendientes de escribir; con la cola llena se descartan en vez de bloquear la petición
+log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Registros por segundo por plantilla de mensaje (0 = sin límite)
+log_rate_limit: int = int(os.getenv("LOG_RATE_LIMIT", "50"))
+
+# Registro de consultas SQL: "off", "sampled" (muestreo + límite por plantilla SQL) o "all"
+sql_log_mode: str = os.getenv("SQL_LOG", "sampled").lower()
+sql_log_sample_rate: float = float(os.getenv("SQL_LOG_SAMPLE_RATE", "0.01"))
+sql_log_rate_limit: int = int(os.getenv("SQL_LOG_RATE_LIMIT", "1"))
+
+# Tope de plantillas distintas con contador propio; al llenarse se reinician los contadores
+_MAX_TEMPLATES = 1000
+
+SqlLogMode = Literal["off", "sampled", "all"]
+LogLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+# ============================================================
+#                  PER-TEMPLATE SAMPLING AND RATE LIMITS
+# ============================================================
+
+class TemplateSampler:
+    # Ventana de un segundo por plantilla; cuenta lo descartado para informarlo en el siguiente registro
+
+    def __init__( self, limit: int, rate: float = 1.0 ):
+        self.limit = limit
+        self.rate = rate
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def admit( self, key ) -> int | None:
+        # None = descartar; si no, cuántos registros de esta plantilla se descartaron desde el último
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None:
+                if len(self._windows) >= _MAX_TEMPLATES:
+                    self._windows.clear()
+                # La primera aparición de una plantilla siempre se registra
+                self._windows[key] = [now, 1, 0]
+                return 0
+            if now - window[0] >= 1.0:
+                window[0] = now
+                window[1] = 0
+            if (self.limit and window[1] >= self.limit) or (self.rate < 1.0 and random.random() >= self.rate):
+                window[2] += 1
+                self.suppressed += 1
+                return None
+            window[1] += 1
+            skipped = window[2]
+            window[2] = 0
+            return skipped
+
+
+class RateLimitFilter(logging.Filter):
+    # Con formateo perezoso record.msg es la plantilla ("Error %s"), no el texto ya formateado
+
+    def __init__( self, limit: int ):
+        super().__init__()
+        self.sampler = TemplateSampler(limit)
+
+    def filter( self, record ) -> bool:
+        if not self.sampler.limit:
+            return True
+        skipped = self.sampler.admit((record.name, record.msg))
+        if skipped is None:
+            return False
+        if skipped:
+            record.suppressed = skipped
+        return True
+
+
+# ============================================================
+#                  QUEUE HANDLER AND FORMATTERS
+# ============================================================
+
+class DroppingQueueHandler(QueueHandler):
+    # El hilo de la petición solo encola el registro: formateo y escritura ocurren en el hilo del listener
+
+    def __init__( self, log_queue ):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare( self, record ):
+        # QueueHandler.prepare formatea aquí el mensaje; se deja para el listener.
+        # Los argumentos viajan sin copiar: no registrar objetos que se modifiquen después.
+        if not hasattr(record, "trace_id"):
+            trace_id = current_trace_id()
+            if trace_id is not None:
+                record.trace_id = trace_id
+        return record
+
+    def enqueue( self, record ):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+
+    def format( self, record ) -> str:
+        document = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds")
+            , "level": record.levelname
+            , "logger": record.name
+            , "message": record.getMessage()
+        }
+        # Los campos pasados con extra={...} se escriben como claves propias
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRIBUTES and not key.startswith("_"):
+                document[key] = value
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def format( self, record ) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            text += f" ({suppressed} registros similares omitidos)"
+        return text
+
+
+_handler: DroppingQueueHandler | None = None
+_listener: QueueListener | None = None
+_rate_filter: RateLimitFilter | None = None
+_setup_lock = threading.Lock()
+
+def setup_logging():
+    # Idempotente: cada módulo que antes llamaba a basicConfig llama aquí
+    global _handler, _listener, _rate_filter
+    with _setup_lock:
+        if _handler is not None:
+            return
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+        log_queue = queue.Queue(maxsize=log_queue_size)
+        _handler = DroppingQueueHandler(log_queue)
+        _rate_filter = RateLimitFilter(log_rate_limit)
+        _handler.addFilter(_rate_filter)
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(log_level)
+
+        _listener = QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    # Vacía la cola antes de salir
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# ============================================================
+#                  SQL QUERY LOGGING (RUNTIME TOGGLE)
+# ============================================================
+
+_sql_sampler = TemplateSampler(sql_log_rate_limit, sql_log_sample_rate)
+
+def log_query( logger: logging.Logger, sql_template: str, message: str, *args, **fields ):
+    # Un registro por consulta; con SQL_LOG=off no se construye nada.
+    # El mensaje recibe la plantilla en una línea como último argumento.
+    if sql_log_mode == "off" or not logger.isEnabledFor(logging.INFO):
+        return
+    skipped = 0
+    if sql_log_mode == "sampled":
+        skipped = _sql_sampler.admit(sql_template)
+        if skipped is None:
+            return
+    label = query_label(sql_template)
+    logger.info(message, *args, label, extra={"sql": label, "suppressed": skipped, **fields})
+
+def configure_logging( sql: str | None = None, level: str | None = None, broadcast: bool = True ) -> dict:
+    # Cambio en caliente; el resto de workers lo recibe por el bus de invalidación
+    global sql_log_mode
+    if sql is not None:
+        sql_log_mode = sql
+    if level is not None:
+        logging.getLogger().setLevel(level)
+    if broadcast and (sql is not None or level is not None):
+        publish_invalidation("logging", [sql, level])
+    return logging_settings()
+
+def logging_settings() -> dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger().level)
+        , "format": log_format
+        , "sql": sql_log_mode
+        , "sql_sample_rate": sql_log_sample_rate
+        , "sql_rate_limit": sql_log_rate_limit
+        , "rate_limit": log_rate_limit
+        , "queued": _handler.queue.qsize() if _handler else 0
+        , "dropped": _handler.dropped if _handler else 0
+        , "suppressed": (_rate_filter.sampler.suppressed if _rate_filter else 0) + _sql_sampler.suppressed
+    }
+
+on_remote_invalidation("logging", lambda key: configure_logging(key[0], key[1], broadcast=False))
@@ -0,0 +1,161 @@
+import contextvars
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+
+metrics_enabled: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Tope de plantillas SQL distintas como etiqueta; el resto se agrupa en "other"
+metrics_max_queries: int = int(os.getenv("METRICS_MAX_QUERIES", "200"))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+
+# ============================================================
+#                  HISTOGRAMS AND GAUGES
+# ============================================================
+
+class Histogram:
+    # Cubetas fijas; la observación solo busca la cubeta e incrementa, la acumulación se hace al exportar
+
+    def __init__( self, name: str, help: str, labelnames: tuple, buckets: tuple = LATENCY_BUCKETS ):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+        _histograms.append(self)
+
+    def observe( self, labels: tuple, value: float ):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render( self ) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [ (labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items() ]
+        for labels, counts, total, count in snapshot:
+            base = _format_labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+_histograms: list[Histogram] = []
+_gauges: list[tuple] = []
+
+def register_gauge( name: str, help: str, read ):
+    # read() se evalúa solo al exportar
+    _gauges.append((name, help, read))
+
+def _escape( value ) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels( names: tuple, values: tuple ) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+def render_metrics() -> str:
+    lines = []
+    for name, help, read in _gauges:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge", f"{name} {read()}"]
+    for histogram in _histograms:
+        lines += histogram.render()
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+#                  SQL TEMPLATE METRICS
+# ============================================================
+
+query_connect = Histogram("db_query_connect_seconds", "Tiempo esperando una conexión del pool", ("query",))
+query_execute = Histogram("db_query_execute_seconds", "Tiempo de cursor.execute hasta el primer resultado", ("query",))
+query_fetch = Histogram("db_query_fetch_seconds", "Tiempo leyendo y construyendo las filas", ("query",))
+query_rows = Histogram("db_query_rows", "Filas devueltas por consulta", ("query",), ROW_BUCKETS)
+query_serialize = Histogram("db_query_serialize_seconds", "Tiempo codificando a JSON el resultado de la consulta", ("query",))
+
+_labels: dict[str, str] = {}
+_labels_lock = threading.Lock()
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_whitespace = re.compile(r"\s+")
+
+# Última plantilla ejecutada en la petición actual, para atribuirle la serialización
+_last_query = contextvars.ContextVar("last_query", default=None)
+
+def query_label( sql: str ) -> str:
+    # Plantilla normalizada: espacios colapsados y literales sustituidos por ?; se memoriza por texto exacto
+    label = _labels.get(sql)
+    if label is not None:
+        return label
+    label = _literals.sub("?", _whitespace.sub(" ", sql).strip())[:300]
+    with _labels_lock:
+        if len(_labels) >= metrics_max_queries:
+            return "other"
+        _labels[sql] = label
+    return label
+
+def record_query( sql: str, connect: float, execute: float, fetch: float, rows: int ):
+    if not metrics_enabled:
+        return
+    labels = (query_label(sql),)
+    query_connect.observe(labels, connect)
+    query_execute.observe(labels, execute)
+    query_fetch.observe(labels, fetch)
+    query_rows.observe(labels, rows)
+
+def mark_query( sql: str ):
+    if metrics_enabled:
+        _last_query.set(sql)
+
+def record_serialize( seconds: float ):
+    sql = _last_query.get()
+    if metrics_enabled and sql is not None:
+        query_serialize.observe((query_label(sql),), seconds)
+
+
+# ============================================================
+#                  HTTP REQUEST LATENCY
+# ============================================================
+
+request_duration = Histogram("http_request_duration_seconds", "Latencia de las peticiones por ruta", ("method", "route", "status"))
+
+class MetricsMiddleware:
+    # Middleware ASGI puro: sin BaseHTTPMiddleware ni copias del cuerpo
+
+    def __init__( self, app ):
+        self.app = app
+
+    async def __call__( self, scope, receive, send ):
+        if scope["type"] != "http" or not metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status( message ):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # FastAPI deja la ruta resuelta en el scope; se usa su plantilla para no multiplicar etiquetas por id
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            request_duration.observe((scope["method"], path, str(status_code)), time.perf_counter() - started)
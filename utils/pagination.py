@@ -0,0 +1,139 @@
+import base64
+import datetime
+import json
+import os
+import typing
+
+from fastapi import HTTPException
+
+# Tope de ?limit= para cualquier listado paginado
+max_page_size: int = int(os.getenv("API_MAX_PAGE_SIZE", "1000"))
+
+
+def _cursor_value( value ):
+    # ISO con milisegundos: DATETIME no admite más decimales y str(datetime) pondría seis
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(timespec="milliseconds")
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+def encode_cursor( values ) -> str:
+    raw = json.dumps(list(values), default=_cursor_value, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def decode_cursor( token: str, size: int ) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def _temporal_type( model, field: str ):
+    # datetime o date si el campo del modelo lo es (también dentro de Optional)
+    info = model.model_fields.get(field) if model is not None else None
+    if info is None:
+        return None
+    for candidate in (info.annotation, *typing.get_args(info.annotation)):
+        if candidate in (datetime.datetime, datetime.date):
+            return candidate
+    return None
+
+def _parse_value( value, kind ):
+    # En el cursor las fechas viajan como texto; se vuelven a enlazar con su tipo
+    if value is None or kind is None:
+        return value
+    try:
+        return kind.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _normalize_key( key ) -> tuple:
+    # (expresión SQL, campo) o (expresión SQL, campo, descendente, admite NULL)
+    column, field, *rest = key
+    descending = rest[0] if len(rest) > 0 else False
+    nullable = rest[1] if len(rest) > 1 else False
+    return column, field, descending, nullable
+
+def _same( column: str, value ) -> tuple[str, list]:
+    if value is None:
+        return f"{column} IS NULL", []
+    return f"{column} = ?", [value]
+
+def _after( column: str, value, descending: bool, nullable: bool ) -> tuple[str, list]:
+    # SQL Server ordena los NULL primero en ASC y al final en DESC
+    if not descending:
+        if value is None:
+            return f"{column} IS NOT NULL", []
+        return f"{column} > ?", [value]
+    if value is None:
+        return "1 = 0", []
+    if nullable:
+        return f"({column} < ? OR {column} IS NULL)", [value]
+    return f"{column} < ?", [value]
+
+def keyset_predicate( keys, values ) -> tuple[str, list]:
+    # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y), que SQL Server resuelve con un seek;
+    # cada columna respeta su dirección y la posición de los NULL
+    keys = [_normalize_key(key) for key in keys]
+    branches = []
+    params = []
+    for position, (column, _, descending, nullable) in enumerate(keys):
+        terms = []
+        for (previous, *_), value in zip(keys[:position], values[:position]):
+            term, term_params = _same(previous, value)
+            terms.append(term)
+            params += term_params
+        term, term_params = _after(column, values[position], descending, nullable)
+        terms.append(term)
+        params += term_params
+        branches.append("(" + " AND ".join(terms) + ")")
+    return "(" + " OR ".join(branches) + ")", params
+
+def order_by( keys ) -> str:
+    keys = [_normalize_key(key) for key in keys]
+    return ", ".join(f"{column} DESC" if descending else column for column, _, descending, _ in keys)
+
+def apply_order( sql: str, keys ) -> str:
+    # Orden sin paginar (listados completos y streaming)
+    return sql.rstrip().rstrip(";") + f"\n        ORDER BY {order_by(keys)};"
+
+
+class Keyset:
+
+    def __init__( self, keys, limit: int, cursor: str | None = None, model=None ):
+        # keys: [(expresión SQL, nombre de la columna en el resultado[, descendente, admite NULL]), ...]
+        # model: modelo del listado; de él sale el tipo de las claves de fecha al leer el cursor
+        self.keys = [_normalize_key(key) for key in keys]
+        self.fields = [field for _, field, _, _ in self.keys]
+        self.limit = limit
+        self.after = None
+        if cursor:
+            values = decode_cursor(cursor, len(keys))
+            self.after = [ _parse_value(value, _temporal_type(model, field)) for value, field in zip(values, self.fields) ]
+
+    def apply( self, sql: str, params, has_where: bool = False ) -> tuple[str, list]:
+        sql = sql.rstrip().rstrip(";")
+        params = list(params)
+
+        if self.after is not None:
+            predicate, predicate_params = keyset_predicate(self.keys, self.after)
+            sql += f"\n        {'AND' if has_where else 'WHERE'} {predicate}"
+            params += predicate_params
+
+        # Se pide una fila extra para saber si existe una página siguiente
+        sql += f"\n        ORDER BY {order_by(self.keys)}\n        OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY;"
+        params.append(self.limit + 1)
+        return sql, params
+
+    def page( self, rows ) -> dict:
+        items = rows[:self.limit]
+        next_cursor = None
+        if len(rows) > self.limit:
+            last = items[-1]
+            next_cursor = encode_cursor([last[field] for field in self.fields])
+        return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,179 @@
+import asyncio
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from utils.admin import ADMIN_PATHS
+
+logger = logging.getLogger(__name__)
+
+# Perfilado bajo demanda: con la cabecera PROFILE_HEADER igual a PROFILE_TOKEN, o por muestreo
+profile_token: str = os.getenv("PROFILE_TOKEN", "")
+profile_header: str = os.getenv("PROFILE_HEADER", "X-Profile").lower()
+# Fracción de peticiones perfiladas sin cabecera (0 = solo bajo demanda)
+profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Los perfiles se guardan en formato pstats (.prof), legible con pstats, snakeviz o pyprof2calltree
+profile_dir: str = os.getenv("PROFILE_DIR", "profiles")
+# Se conservan los más recientes; los demás se borran al guardar uno nuevo
+profile_max_files: int = int(os.getenv("PROFILE_MAX_FILES", "100"))
+
+# Desde Python 3.12 cProfile usa sys.monitoring: ve todos los hilos (también el executor de la BD),
+# pero solo puede haber un perfilador activo por proceso. Una petición perfilada a la vez.
+_profile_lock = threading.Lock()
+_captures = OrderedDict()
+_slug = re.compile(r"[^A-Za-z0-9]+")
+
+
+def profiling_enabled() -> bool:
+    return bool(profile_token) or profile_sample_rate > 0
+
+
+# ============================================================
+#                  CAPTURE AND STORAGE
+# ============================================================
+
+def _top_functions( profiler: cProfile.Profile, count: int = 5 ) -> list[dict]:
+    # Resumen de las funciones con más tiempo propio, para el listado
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    entries = sorted(stats.stats.items(), key=lambda item: -item[1][2])[:count]
+    return [
+        {"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls, "tottime_ms": round(tottime * 1000, 3), "cumtime_ms": round(cumtime * 1000, 3)}
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in entries
+    ]
+
+def _save( profiler: cProfile.Profile, name: str, metadata: dict ):
+    os.makedirs(profile_dir, exist_ok=True)
+    profiler.dump_stats(os.path.join(profile_dir, name))
+    metadata["top"] = _top_functions(profiler)
+    _captures[name] = metadata
+    _prune()
+
+def _prune():
+    files = sorted(
+        (entry for entry in os.scandir(profile_dir) if entry.name.endswith(".prof"))
+        , key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in files[:max(0, len(files) - profile_max_files)]:
+        try:
+            os.remove(entry.path)
+        except OSError as e:
+            logger.warning("No se pudo borrar el perfil %s: %s", entry.name, e)
+        _captures.pop(entry.name, None)
+    while len(_captures) > profile_max_files:
+        _captures.popitem(last=False)
+
+def list_profiles( limit: int = 50 ) -> list[dict]:
+    # Incluye archivos de ejecuciones anteriores (sin metadatos más allá del tamaño y la fecha)
+    if not os.path.isdir(profile_dir):
+        return []
+    files = sorted(
+        (entry for entry in os.scandir(profile_dir) if entry.name.endswith(".prof"))
+        , key=lambda entry: entry.stat().st_mtime
+        , reverse=True
+    )[:limit]
+    return [
+        {"name": entry.name, "size": entry.stat().st_size, "created": entry.stat().st_mtime, **_captures.get(entry.name, {})}
+        for entry in files
+    ]
+
+def profile_path( name: str ) -> str:
+    # Solo nombres generados aquí; evita salir del directorio
+    if os.path.basename(name) != name or not name.endswith(".prof"):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    path = os.path.join(profile_dir, name)
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return path
+
+
+# ============================================================
+#                  PROFILING MIDDLEWARE
+# ============================================================
+
+class ProfilingMiddleware:
+    # Middleware ASGI puro: cubre ruta, controlador, consultas y serialización hasta el último byte enviado
+
+    def __init__( self, app ):
+        self.app = app
+        self._header = profile_header.encode("latin-1")
+        self._token = profile_token.encode("latin-1")
+
+    def _trigger( self, scope ) -> str | None:
+        # Las llamadas de administración no dejan perfiles, aunque ADMIN_HEADER coincida con PROFILE_HEADER
+        if scope["path"].startswith(ADMIN_PATHS):
+            return None
+        if self._token:
+            for key, value in scope["headers"]:
+                if key == self._header:
+                    return "header" if hmac.compare_digest(value, self._token) else None
+        if profile_sample_rate > 0 and random.random() < profile_sample_rate:
+            return "sample"
+        return None
+
+    async def __call__( self, scope, receive, send ):
+        if scope["type"] != "http" or not profiling_enabled():
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self._trigger(scope)
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if not _profile_lock.acquire(blocking=False):
+            # Ya hay una captura en curso; esta petición sigue sin perfilar
+            await self.app(scope, receive, send)
+            return
+
+        name = None
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_profile( message ):
+            nonlocal name, status_code
+            if message["type"] == "http.response.start":
+                # La ruta ya está resuelta: se usa su plantilla en el nombre del archivo
+                status_code = message["status"]
+                route = getattr(scope.get("route"), "path", scope["path"])
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method']}-{_slug.sub('_', route).strip('_') or 'root'}-{os.urandom(3).hex()}.prof"
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", name.encode("latin-1"))]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        try:
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Otro perfilador del proceso (p. ej. python -m cProfile) ya ocupa sys.monitoring
+                logger.warning("No se pudo iniciar el perfilado: %s", e)
+                await self.app(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send_with_profile)
+            finally:
+                profiler.disable()
+            if name is not None:
+                metadata = {
+                    "method": scope["method"]
+                    , "path": scope["path"]
+                    , "route": getattr(scope.get("route"), "path", None)
+                    , "status": status_code
+                    , "duration_ms": round((time.perf_counter() - started) * 1000, 3)
+                    , "trigger": trigger
+                }
+                try:
+                    # Escribir y resumir el perfil no debe retener el event loop
+                    await asyncio.to_thread(_save, profiler, name, metadata)
+                except Exception as e:
+                    logger.error("No se pudo guardar el perfil %s: %s", name, e)
+        finally:
+            _profile_lock.release()
@@ -0,0 +1,142 @@
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from utils.pagination import max_page_size
+
+
+def parse_id_list( value: str ) -> list[int]:
+    # "3,1,2" -> [3, 1, 2], respetando el orden pedido
+    try:
+        ids = [ int(part) for part in value.split(",") if part.strip() ]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids must not be empty")
+    if len(ids) > max_page_size:
+        raise HTTPException(status_code=400, detail=f"ids is limited to {max_page_size} values")
+    return ids
+
+def parse_include( value: str, allowed ) -> list[str]:
+    # "players,platforms" -> ["players", "platforms"], validado contra las relaciones disponibles
+    names = list(dict.fromkeys( part.strip() for part in value.split(",") if part.strip() ))
+    unknown = [ name for name in names if name not in allowed ]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return names
+
+def parse_sort( value: str | None, allowed: dict, tiebreak: list ) -> list:
+    # "-release_date,title" -> claves de orden; la clave primaria se añade al final para que el orden sea total
+    # allowed: { nombre: (expresión SQL, admite NULL) }, tiebreak: [(expresión SQL, campo), ...]
+    keys = []
+    seen = set()
+    if value:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            descending = part.startswith("-")
+            name = part.lstrip("+-")
+            if name not in allowed:
+                raise HTTPException(status_code=400, detail=f"Unknown sort field: {name}. Allowed: {', '.join(allowed)}")
+            if name in seen:
+                continue
+            column, nullable = allowed[name]
+            keys.append((column, name, descending, nullable))
+            seen.add(name)
+    for column, field in tiebreak:
+        if field not in seen:
+            keys.append((column, field, False, False))
+    return keys
+
+
+def escape_like( value: str ) -> str:
+    # Los comodines del usuario se buscan de forma literal
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("[", "\\[")
+
+
+class Filters:
+    # Acumula predicados parametrizados con formas que SQL Server puede resolver con un índice (sin funciones sobre la columna)
+
+    def __init__(self):
+        self.clauses = []
+        self.params = []
+
+    def __bool__(self):
+        return bool(self.clauses)
+
+    def equals( self, column: str, value ):
+        if value is not None:
+            self.clauses.append(f"{column} = ?")
+            self.params.append(value)
+        return self
+
+    def between( self, column: str, start, end ):
+        # Rango cerrado [start, end]
+        if start is not None:
+            self.clauses.append(f"{column} >= ?")
+            self.params.append(start)
+        if end is not None:
+            self.clauses.append(f"{column} <= ?")
+            self.params.append(end)
+        return self
+
+    def window( self, column: str, start, end ):
+        # Ventana semiabierta [start, end) para columnas de fecha y hora
+        if start is not None:
+            self.clauses.append(f"{column} >= ?")
+            self.params.append(start)
+        if end is not None:
+            self.clauses.append(f"{column} < ?")
+            self.params.append(end)
+        return self
+
+    def prefix( self, column: str, value: str | None ):
+        # LIKE 'abc%' sin comodín inicial sigue siendo un seek sobre el índice
+        if value:
+            self.clauses.append(f"{column} LIKE ? ESCAPE '\\'")
+            self.params.append(escape_like(value) + "%")
+        return self
+
+    def apply( self, sql: str, params, has_where: bool = False ) -> tuple[str, list]:
+        params = list(params)
+        if not self.clauses:
+            return sql, params
+        sql = sql.rstrip().rstrip(";")
+        sql += f"\n        {'AND' if has_where else 'WHERE'} " + "\n            AND ".join(self.clauses)
+        return sql, params + self.params
+
+
+class Projection:
+    # Columnas seleccionables con ?fields= : campo -> (expresión SQL, join que necesita o None)
+
+    def __init__( self, model: type[BaseModel], columns: dict, joins: dict | None = None, display: tuple = () ):
+        # Solo se exponen campos del modelo o columnas de presentación declaradas (nombres de joins, alias)
+        unknown = set(columns) - set(model.model_fields) - set(display)
+        if unknown:
+            raise ValueError(f"{model.__name__} has no fields {sorted(unknown)}")
+        self.model = model
+        self.columns = columns
+        self.joins = joins or {}
+
+    def parse( self, value: str | None, required=() ) -> list[str] | None:
+        # None = todas las columnas; los campos requeridos (claves de orden y cursor) se añaden siempre
+        if value is None:
+            return None
+        fields = list(dict.fromkeys( part.strip() for part in value.split(",") if part.strip() ))
+        unknown = [ field for field in fields if field not in self.columns ]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(self.columns)}")
+        if not fields:
+            raise HTTPException(status_code=400, detail="fields must not be empty")
+        return fields + [ field for field in required if field not in fields ]
+
+    def select( self, fields: list[str] | None ) -> str:
+        fields = fields or list(self.columns)
+        return "\n            , ".join(self.columns[field][0] for field in fields)
+
+    def join( self, fields: list[str] | None ) -> str:
+        # Solo los joins que aportan alguna de las columnas pedidas
+        fields = fields or list(self.columns)
+        needed = { self.columns[field][1] for field in fields }
+        return "\n        ".join(sql for name, sql in self.joins.items() if name in needed)
@@ -0,0 +1,61 @@
+import os
+import time
+from typing import Literal
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from utils.database import dumps_rows
+from utils.metrics import record_serialize
+from utils.tracing import span
+
+# Con JSON_PASSTHROUGH=false las rutas vuelven a devolver objetos y FastAPI los codifica
+json_passthrough: bool = os.getenv("JSON_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+
+
+# ?stream=ndjson (una fila por línea) o ?stream=json (arreglo enviado por partes)
+StreamMode = Literal["ndjson", "json"]
+
+
+class RawJSONResponse(Response):
+    media_type = "application/json"
+
+
+def json_response( content, status_code: int = 200, headers: dict | None = None ):
+    if not json_passthrough:
+        if headers:
+            return JSONResponse(content=jsonable_encoder(content), status_code=status_code, headers=headers)
+        return content
+    # Se escribe el JSON ya codificado, sin pasar por jsonable_encoder ni validaciones
+    with span("serialize"):
+        started = time.perf_counter()
+        body = dumps_rows(content).encode("utf-8")
+        record_serialize(time.perf_counter() - started)
+    return RawJSONResponse(content=body, status_code=status_code, headers=headers)
+
+
+async def _ndjson_chunks( stream ):
+    try:
+        async for rows in stream:
+            yield "".join(dumps_rows(row) + "\n" for row in rows).encode("utf-8")
+    finally:
+        stream.close()
+
+async def _json_array_chunks( stream ):
+    try:
+        yield b"["
+        first = True
+        async for rows in stream:
+            # Cada lote se codifica como arreglo y se le quitan los corchetes
+            chunk = dumps_rows(rows)[1:-1]
+            yield (chunk if first else "," + chunk).encode("utf-8")
+            first = False
+        yield b"]"
+    finally:
+        stream.close()
+
+def streaming_response( stream, mode: str, headers: dict | None = None ):
+    if mode == "ndjson":
+        return StreamingResponse(_ndjson_chunks(stream), media_type="application/x-ndjson", headers=headers)
+    return StreamingResponse(_json_array_chunks(stream), media_type="application/json", headers=headers)
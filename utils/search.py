@@ -0,0 +1,215 @@
+import asyncio
+import heapq
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+# Resultados por defecto y tope de ?limit= en /search
+search_default_limit: int = int(os.getenv("SEARCH_DEFAULT_LIMIT", "10"))
+search_max_limit: int = int(os.getenv("SEARCH_MAX_LIMIT", "100"))
+# Caracteres mínimos de ?q= : con uno solo casi todo el índice es candidato
+search_min_length: int = int(os.getenv("SEARCH_MIN_LENGTH", "2"))
+# Tope de documentos puntuados por búsqueda; acota el trabajo de las consultas muy comunes
+search_max_candidates: int = int(os.getenv("SEARCH_MAX_CANDIDATES", "5000"))
+# Fracción mínima de trigramas de la consulta que debe contener un resultado (tolerancia a erratas)
+search_min_similarity: float = float(os.getenv("SEARCH_MIN_SIMILARITY", "0.5"))
+# Espera entre reintentos de carga tras un fallo
+search_retry_interval: float = float(os.getenv("SEARCH_RETRY_INTERVAL", "30"))
+# Recarga completa periódica (0 = nunca); recoge cambios hechos por otros workers
+search_refresh_interval: float = float(os.getenv("SEARCH_REFRESH_INTERVAL", "0"))
+
+
+def normalize( text: str ) -> str:
+    # Minúsculas y sin acentos: "Pokémon" y "pokemon" se indexan igual
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+def _trigrams( text: str, partial_last: bool = False ) -> set[str]:
+    # Cada palabra se rellena con espacios para que los trigramas iniciales marquen el comienzo de palabra;
+    # en una consulta la última palabra puede estar a medio escribir y no se cierra
+    grams = set()
+    words = text.split()
+    for position, word in enumerate(words):
+        closing = "" if partial_last and position == len(words) - 1 else " "
+        padded = f"  {word}{closing}"
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class SearchIndex:
+    # Índice invertido de trigramas en memoria sobre una columna de texto
+
+    def __init__( self, name: str, field: str, fields: list[str], source ):
+        # source: corrutina sin argumentos que devuelve las filas a indexar
+        self.name = name
+        self.field = field
+        self.fields = fields
+        self.source = source
+        self._lock = threading.Lock()
+        self._load_lock = asyncio.Lock()
+        self._documents = {}
+        self._postings = defaultdict(set)
+        self._pending = None
+        self.loaded = False
+        self.loaded_at = 0.0
+        self.failed_at = 0.0
+        self.searches = 0
+        _indexes[name] = self
+
+    # ---------------- mantenimiento ----------------
+
+    def _insert( self, documents, postings, row ):
+        text = row.get(self.field)
+        if not text:
+            return
+        document = { field: row.get(field) for field in self.fields }
+        normalized = normalize(str(text))
+        grams = _trigrams(normalized)
+        documents[row["id"]] = (normalized, grams, document)
+        for gram in grams:
+            postings[gram].add(row["id"])
+
+    def _delete( self, documents, postings, id ):
+        entry = documents.pop(id, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            ids = postings.get(gram)
+            if ids is not None:
+                ids.discard(id)
+                if not ids:
+                    del postings[gram]
+
+    def add( self, row ):
+        # Alta o reemplazo de un documento
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("add", row))
+            self._delete(self._documents, self._postings, row["id"])
+            self._insert(self._documents, self._postings, row)
+
+    def remove( self, id ):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("remove", id))
+            self._delete(self._documents, self._postings, id)
+
+    async def load( self ) -> bool:
+        async with self._load_lock:
+            with self._lock:
+                # Los cambios que lleguen mientras se consulta la tabla se repiten sobre el índice nuevo
+                self._pending = []
+            try:
+                started = time.perf_counter()
+                rows = await self.source()
+                documents, postings = await asyncio.to_thread(self._build, rows)
+            except Exception as e:
+                with self._lock:
+                    self._pending = None
+                self.failed_at = time.monotonic()
+                logger.error("No se pudo cargar el índice de búsqueda %s: %s", self.name, e)
+                return False
+
+            with self._lock:
+                for operation, value in self._pending:
+                    if operation == "add":
+                        self._delete(documents, postings, value["id"])
+                        self._insert(documents, postings, value)
+                    else:
+                        self._delete(documents, postings, value)
+                self._documents = documents
+                self._postings = postings
+                self._pending = None
+                self.loaded = True
+                self.loaded_at = time.monotonic()
+
+            logger.info("Índice %s: %d documentos en %.1f ms", self.name, len(documents), (time.perf_counter() - started) * 1000)
+            return True
+
+    def _build( self, rows ):
+        documents = {}
+        postings = defaultdict(set)
+        for row in rows:
+            self._insert(documents, postings, row)
+        return documents, postings
+
+    async def ensure_loaded( self ):
+        # Carga perezosa si el arranque falló, respetando el intervalo de reintento
+        now = time.monotonic()
+        if not self.loaded:
+            if now - self.failed_at >= search_retry_interval:
+                await self.load()
+        elif search_refresh_interval and now - self.loaded_at >= search_refresh_interval:
+            await self.load()
+
+    # ---------------- consulta ----------------
+
+    def search( self, query: str, limit: int ) -> list[dict]:
+        # Síncrona y con CPU proporcional a los candidatos: llamarla con asyncio.to_thread
+        normalized = normalize(query)
+        if len(normalized) < search_min_length:
+            return []
+        grams = _trigrams(normalized, partial_last=True)
+        minimum = max(1, int(len(grams) * search_min_similarity))
+
+        with self._lock:
+            self.searches += 1
+            # Quien comparta al menos `minimum` trigramas aparece en alguna de las
+            # len(grams) - minimum + 1 listas más cortas: basta con recorrer esas
+            postings = sorted(( self._postings.get(gram, ()) for gram in grams ), key=len)
+            candidates = {}
+            for ids in postings[:len(grams) - minimum + 1]:
+                for id in ids:
+                    if id not in candidates:
+                        # Las entradas son tuplas que se reemplazan, nunca se modifican: se puntúan fuera del lock
+                        candidates[id] = self._documents[id]
+                        if len(candidates) >= search_max_candidates:
+                            break
+                if len(candidates) >= search_max_candidates:
+                    break
+
+        def scored():
+            for id, (text, document_grams, document) in candidates.items():
+                shared = len(grams & document_grams)
+                if shared < minimum:
+                    continue
+                # Coincidencia exacta > prefijo > prefijo de palabra > subcadena > parecido por trigramas
+                if text == normalized:
+                    bonus = 4.0
+                elif text.startswith(normalized):
+                    bonus = 3.0
+                elif f" {normalized}" in f" {text}":
+                    bonus = 2.0
+                elif normalized in text:
+                    bonus = 1.0
+                else:
+                    bonus = 0.0
+                yield (bonus + shared / len(grams) - len(text) / 1000, -id, document)
+
+        # Solo los `limit` mejores; a igual puntuación, el id menor primero
+        best = heapq.nlargest(limit, scored(), key=lambda entry: entry[:2])
+        return [ {**document, "score": round(score, 4)} for score, _, document in best ]
+
+    def stats( self ) -> dict:
+        with self._lock:
+            return {
+                "loaded": self.loaded
+                , "documents": len(self._documents)
+                , "grams": len(self._postings)
+                , "searches": self.searches
+            }
+
+
+_indexes: dict[str, SearchIndex] = {}
+
+async def load_search_indexes():
+    # Arranque: un fallo no impide levantar la API; el índice se reintenta en la primera búsqueda
+    await asyncio.gather(*[ index.load() for index in _indexes.values() ])
+
+def search_stats() -> dict:
+    return { name: index.stats() for name, index in _indexes.items() }
@@ -0,0 +1,48 @@
+import asyncio
+
+
+class SingleFlight:
+    # Llamadas idénticas concurrentes comparten una sola ejecución en curso;
+    # todos los que esperan reciben el mismo resultado (no debe modificarse)
+
+    def __init__( self, name: str ):
+        self.name = name
+        self._inflight: dict = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        _groups[name] = self
+
+    async def do( self, key, func ):
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.collapsed += 1
+        # shield: si se cancela un cliente, la ejecución sigue para los demás
+        return await asyncio.shield(task)
+
+    def _forget( self, key, task ):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Marca la excepción como leída aunque todos los que esperaban se hayan cancelado
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls
+            , "executions": self.executions
+            , "collapsed": self.collapsed
+            , "in_flight": len(self._inflight)
+        }
+
+
+_groups: dict[str, SingleFlight] = {}
+
+def single_flight_stats() -> dict:
+    return { name: group.stats() for name, group in _groups.items() }
@@ -0,0 +1,247 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+
+logger = logging.getLogger(__name__)
+
+# Cabecera Server-Timing en cada respuesta de las rutas trazadas
+server_timing_enabled: bool = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+# Archivo OTLP/JSON (una ExportTraceServiceRequest por línea); vacío = sin exportar
+trace_export_file: str = os.getenv("TRACE_EXPORT_FILE", "")
+trace_service_name: str = os.getenv("TRACE_SERVICE_NAME", "gamehub-api")
+
+
+# ============================================================
+#                  REQUEST-SCOPED SPANS
+# ============================================================
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__( self, name: str, parent_id: str | None, start: float, attributes: dict | None = None ):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = start
+        self.end = None
+        self.attributes = attributes or {}
+
+
+class Trace:
+    # Los hilos del executor añaden spans a la misma traza, de ahí el lock
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        # Ancla para convertir perf_counter a tiempo Unix al exportar
+        self.wall_anchor = time.time_ns()
+        self.perf_anchor = time.perf_counter()
+
+    def add( self, span: Span ):
+        with self._lock:
+            self.spans.append(span)
+
+    def unix_nanos( self, perf: float ) -> int:
+        return self.wall_anchor + int((perf - self.perf_anchor) * 1e9)
+
+
+_trace = contextvars.ContextVar("trace", default=None)
+_span = contextvars.ContextVar("span", default=None)
+
+def tracing_active() -> bool:
+    return _trace.get() is not None
+
+def current_trace_id() -> str | None:
+    trace = _trace.get()
+    return trace.trace_id if trace is not None else None
+
+@contextmanager
+def span( name: str, **attributes ):
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent else None, time.perf_counter(), attributes)
+    token = _span.set(current)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _span.reset(token)
+        trace.add(current)
+
+def add_span( name: str, start: float, end: float, **attributes ):
+    # Para fases ya cronometradas con perf_counter (p. ej. dentro de _execute_query_sync)
+    trace = _trace.get()
+    if trace is None:
+        return
+    parent = _span.get()
+    current = Span(name, parent.span_id if parent else None, start, attributes)
+    current.end = end
+    trace.add(current)
+
+def traced( func ):
+    # Span por función de controlador: "controller" con el módulo y la función como atributo
+    label = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__name__}"
+
+    @functools.wraps(func)
+    async def wrapper( *args, **kwargs ):
+        if _trace.get() is None:
+            return await func(*args, **kwargs)
+        with span("controller", function=label):
+            return await func(*args, **kwargs)
+    return wrapper
+
+
+# ============================================================
+#                  SERVER-TIMING AND ROUTE CLASS
+# ============================================================
+
+def _nested_in_same_name( current: Span, by_id: dict ) -> bool:
+    parent = by_id.get(current.parent_id)
+    while parent is not None:
+        if parent.name == current.name:
+            return True
+        parent = by_id.get(parent.parent_id)
+    return False
+
+def server_timing( trace: Trace ) -> str:
+    # Duración total por nombre de span, en orden de aparición; un span dentro de otro
+    # del mismo nombre (controlador que llama a otro) no se suma dos veces
+    by_id = { current.span_id: current for current in trace.spans }
+    totals = {}
+    descriptions = {}
+    for current in sorted(trace.spans, key=lambda item: item.start):
+        if _nested_in_same_name(current, by_id):
+            continue
+        totals[current.name] = totals.get(current.name, 0.0) + (current.end - current.start)
+        function = current.attributes.get("function")
+        if function and current.name not in descriptions:
+            descriptions[current.name] = function
+    parts = []
+    for name, total in totals.items():
+        entry = f"{name};dur={total * 1000:.2f}"
+        if name in descriptions:
+            entry += f';desc="{descriptions[name]}"'
+        parts.append(entry)
+    return ", ".join(parts)
+
+
+class TracedRoute(APIRoute):
+    # route_class de los routers: abre la traza, crea el span de la ruta y añade Server-Timing
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        path = self.path
+
+        async def traced_handler( request ):
+            trace = Trace()
+            trace_token = _trace.set(trace)
+            span_token = _span.set(None)
+            try:
+                with span("route", route=path, method=request.method):
+                    response = await handler(request)
+            except HTTPException as e:
+                # 304, 404, ...: la respuesta la arma el manejador de excepciones con estas cabeceras
+                if server_timing_enabled:
+                    e.headers = {**(e.headers or {}), "Server-Timing": server_timing(trace)}
+                raise
+            finally:
+                _span.reset(span_token)
+                _trace.reset(trace_token)
+                _export(trace, path)
+
+            if server_timing_enabled:
+                response.headers["Server-Timing"] = server_timing(trace)
+            return response
+
+        return traced_handler
+
+
+# ============================================================
+#                  OTLP/JSON FILE EXPORTER
+# ============================================================
+
+_export_queue: queue.Queue | None = None
+_export_thread: threading.Thread | None = None
+
+def _attribute( key: str, value ) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def _otlp_document( trace: Trace ) -> dict:
+    spans = []
+    for current in trace.spans:
+        entry = {
+            "traceId": trace.trace_id
+            , "spanId": current.span_id
+            , "name": current.name
+            , "kind": 2 if current.parent_id is None else 1
+            , "startTimeUnixNano": str(trace.unix_nanos(current.start))
+            , "endTimeUnixNano": str(trace.unix_nanos(current.end))
+            , "attributes": [ _attribute(key, value) for key, value in current.attributes.items() ]
+        }
+        if current.parent_id:
+            entry["parentSpanId"] = current.parent_id
+        spans.append(entry)
+    return {
+        "resourceSpans": [{
+            "resource": { "attributes": [_attribute("service.name", trace_service_name)] }
+            , "scopeSpans": [{ "scope": {"name": "utils.tracing"}, "spans": spans }]
+        }]
+    }
+
+def _export( trace: Trace, path: str ):
+    # La petición solo encola; la serialización y la escritura ocurren en el hilo exportador
+    if _export_queue is not None and trace.spans:
+        try:
+            _export_queue.put_nowait(trace)
+        except queue.Full:
+            logger.warning("Cola de exportación de trazas llena, se descarta la traza de %s", path)
+
+def _export_worker( path: str, pending: queue.Queue ):
+    with open(path, "a", encoding="utf-8") as output:
+        while True:
+            trace = pending.get()
+            if trace is None:
+                break
+            try:
+                output.write(json.dumps(_otlp_document(trace), separators=(",", ":")) + "\n")
+                if pending.empty():
+                    output.flush()
+            except Exception as e:
+                logger.error("No se pudo exportar la traza: %s", e)
+
+def start_exporter():
+    global _export_queue, _export_thread
+    if not trace_export_file or _export_thread is not None:
+        return
+    _export_queue = queue.Queue(maxsize=10000)
+    _export_thread = threading.Thread(target=_export_worker, args=(trace_export_file, _export_queue), name="trace-exporter", daemon=True)
+    _export_thread.start()
+    logger.info("Exportando trazas OTLP/JSON a %s", trace_export_file)
+
+def stop_exporter():
+    global _export_queue, _export_thread
+    if _export_thread is None:
+        return
+    _export_queue.put(None)
+    _export_thread.join(timeout=5)
+    _export_queue = None
+    _export_thread = None